@@ -1,4 +1,7 @@
 import re
+import json
+import importlib
+import importlib.util
 import subprocess
 import sys
 from pathlib import Path
@@ -6,7 +9,17 @@ import os
 import shutil
 import time
 import socket
-from typing import Optional
+import queue
+import threading
+import contextlib
+import tempfile
+import statistics
+import secrets
+import hashlib
+import platform
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
 
 
 # ========= 基础工具 =========
@@ -17,9 +30,203 @@ class TimeUtils:
 
 
 class ConsolePrinter:
+    # 并行阶段多个线程同时输出，整行加锁写出，避免两路输出在同一行交错
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _emit(line: str):
+        with ConsolePrinter._lock:
+            print(line, flush=True)
+
     @staticmethod
     def print(prefix: str, msg: str):
-        print(f"{TimeUtils.ts()} [{prefix}]: {msg}", flush=True)
+        ConsolePrinter._emit(f"{TimeUtils.ts()} [{prefix}]: {msg}")
+
+    @staticmethod
+    def raw_from_proc(prefix: str, raw_line: str):
+        """子进程原样行输出，统一加前缀；空白行丢弃。"""
+        s = raw_line.rstrip("\r\n")
+        if not s.strip():
+            return
+        ConsolePrinter._emit(f"{TimeUtils.ts()} [{prefix}] {s}")
+
+
+class LogFilter:
+    """
+    子进程输出的统一过滤流水线（所有安装器与服务输出共用同一套预编译规则，mma_launcher_debug.py 也从这里导入），
+    每个阶段统计丢弃行数：
+    1) prefilter：子串预筛——行内不含任何规则的关键子串时直接放行，不跑正则
+    2) regex：全部规则合并为一个预编译正则（命名分组），一次 search 即可知道命中哪条规则
+    3) noise / rate：噪声规则直接丢弃；限速规则每个时间窗口最多放行 N 行，
+       窗口结束后被压掉的数量随下一行输出（或流结束时）补报
+    4) dedup：只作用于通过前面各阶段的行——连续重复行折叠，重复结束时输出一行 "(repeated Nx)"
+    LOG_FILTER=0 关闭（原样输出，服务也恢复为直接继承控制台）
+    """
+
+    # (正则, 预筛子串)；预筛子串必须出现在任何匹配行中
+    NOISE_RULES = [
+        (r"^Source path:\s+.*frontend[\\/].*\.vue\?vue&type=style.*$", "Source path:"),
+        (r"^\s*JIT TOTAL:\s+\d+(\.\d+)?ms\s*$", "JIT TOTAL:"),
+    ]
+    # (正则, 预筛子串, 每窗口最多行数, 窗口秒数)
+    RATE_RULES = [
+        (r'"GET /writer_seque\S* HTTP/[\d.]+" 200', "/writer_seque", 1, 30.0),
+        (r'"(GET|HEAD) \S+ HTTP/[\d.]+" (200|304)', "HTTP/", 20, 10.0),
+    ]
+    _ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[ -/]*[@-~]")
+    _compiled: dict = {}
+    _compile_lock = threading.Lock()
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.getenv("LOG_FILTER", "1").strip().lower() not in ("0", "false", "no")
+
+    @classmethod
+    def _rules(cls, extra_noise: tuple = ()):
+        """
+        每组额外规则只编译一次；返回 (合并正则, 预筛子串列表, {分组名: 限速参数或 None})。
+        extra_noise：调用方追加的 (正则, 预筛子串) 噪声规则，预筛子串不可为空（否则整条流都无法预筛）。
+        """
+        with cls._compile_lock:
+            if extra_noise not in cls._compiled:
+                parts, literals, limits = [], [], {}
+                rules = [(rx, lit, None) for rx, lit in list(cls.NOISE_RULES) + list(extra_noise)]
+                rules += [(rx, lit, (n, w)) for rx, lit, n, w in cls.RATE_RULES]
+                for i, (rx, lit, limit) in enumerate(rules):
+                    if not lit:
+                        raise ValueError(f"LogFilter rule {rx!r} needs a prefilter literal")
+                    parts.append(f"(?P<r{i}>{rx})")
+                    literals.append(lit)
+                    limits[f"r{i}"] = limit
+                cls._compiled[extra_noise] = (re.compile("|".join(parts)), literals, limits)
+            return cls._compiled[extra_noise]
+
+    def __init__(self, name: str, extra_noise: list = None):
+        self.name = name
+        self.enabled_ = LogFilter.enabled()
+        self.regex, self.literals, self.limits = LogFilter._rules(tuple(tuple(r) for r in extra_noise or ()))
+        self.stats = {"prefilter_pass": 0, "noise": 0, "rate": 0, "dedup": 0}
+        self._windows: dict[str, list] = {}  # 分组名 -> [窗口起点, 已放行, 已压掉]
+        self._pending: list[str] = []  # 已结束窗口的限速补报行，随下一条输出的行一起输出
+        self._last: Optional[str] = None
+        self._repeats = 0
+
+    def _plain(self, line: str) -> str:
+        return self._ANSI_RE.sub("", line) if "\x1b" in line else line
+
+    def _rate_ok(self, group: str, now: float) -> bool:
+        limit, window = self.limits[group]
+        w = self._windows.setdefault(group, [now, 0, 0])
+        if now - w[0] >= window:
+            self._roll(group, w)  # 旧窗口被压掉的数量转入待补报
+            w[:] = [now, 0, 0]
+        if w[1] < limit:
+            w[1] += 1
+            return True
+        w[2] += 1
+        self.stats["rate"] += 1
+        return False
+
+    def _roll(self, group: str, w: list):
+        if w[2]:
+            window = self.limits[group][1]
+            self._pending.append(f"({w[2]} similar line(s) rate-limited in the last {window:.0f}s)")
+            w[2] = 0
+
+    def _rate_notes(self, now: Optional[float]) -> list[str]:
+        """
+        取出待补报的限速计数：now 为 None（流结束）时所有窗口都补报，
+        否则只补报已结束的窗口（限速的行不再出现时，计数随下一条输出的行补报）。
+        """
+        for group, w in self._windows.items():
+            if now is None or now - w[0] >= self.limits[group][1]:
+                self._roll(group, w)
+        notes, self._pending = self._pending, []
+        return notes
+
+    def _dedup_notes(self) -> list[str]:
+        if self._repeats:
+            n, self._repeats = self._repeats, 0
+            return [f"(previous line repeated {n}x)"]
+        return []
+
+    def process(self, line: str) -> list[str]:
+        """输入一行（不含换行），返回应输出的行（可能为空，也可能带上补报行）。"""
+        if not self.enabled_:
+            return [line]
+        plain = self._plain(line).strip()
+        now = time.monotonic()
+
+        if not any(s in plain for s in self.literals):
+            self.stats["prefilter_pass"] += 1
+        else:
+            m = self.regex.search(plain)
+            if m is not None:
+                if self.limits[m.lastgroup] is None:
+                    self.stats["noise"] += 1
+                    return []
+                if not self._rate_ok(m.lastgroup, now):
+                    return []
+
+        # 只有真正要输出的行才参与去重
+        if plain == self._last:
+            self._repeats += 1
+            self.stats["dedup"] += 1
+            return []
+        out = self._dedup_notes() + self._rate_notes(now)
+        self._last = plain
+        return out + [line]
+
+    def flush(self) -> list[str]:
+        """流结束时调用：输出尚未报告的重复计数与限速计数。"""
+        if not self.enabled_:
+            return []
+        return self._dedup_notes() + self._rate_notes(None)
+
+    def summary(self) -> Optional[str]:
+        dropped = {k: v for k, v in self.stats.items() if k != "prefilter_pass" and v}
+        if not dropped:
+            return None
+        parts = ", ".join(f"{v} {k}" for k, v in dropped.items())
+        return f"filtered {parts} (prefilter skipped regex on {self.stats['prefilter_pass']} lines)"
+
+
+class SubprocessStreamer:
+    """运行子进程并逐行转发输出（带前缀、经 LogFilter 过滤），返回退出码。"""
+
+    @staticmethod
+    def run(cmd: list, prefix: str, env: dict = None, cwd=None, on_line: Callable[[str], object] = None) -> int:
+        """on_line：每行原始输出（过滤之前）都会先交给它，用于解析进度等结构化信息。"""
+        with PROFILER.span(f"subprocess:{prefix}", kind="subprocess"):
+            return SubprocessStreamer._run(cmd, prefix, env, cwd, on_line)
+
+    @staticmethod
+    def _run(cmd: list, prefix: str, env: dict, cwd, on_line: Callable[[str], object] = None) -> int:
+        proc = subprocess.Popen(
+            cmd,
+            cwd=str(cwd) if cwd else None,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+        )
+        assert proc.stdout is not None
+        log_filter = LogFilter(prefix)
+        for line in proc.stdout:
+            if on_line is not None:
+                on_line(line)
+            for out in log_filter.process(line.rstrip("\r\n")):
+                ConsolePrinter.raw_from_proc(prefix, out)
+        for out in log_filter.flush():
+            ConsolePrinter.raw_from_proc(prefix, out)
+        summary = log_filter.summary()
+        if summary:
+            ConsolePrinter.print(prefix, summary)
+        proc.wait()
+        return proc.returncode
 
 
 class OutputConfigurator:
@@ -32,33 +239,253 @@ class OutputConfigurator:
 
 
 class Bootstrapper:
-    """引导安装：按需安装第三方库（pip）"""
+    """
+    引导安装：按需安装第三方库（pip）
+    1) 只用 importlib.util.find_spec 判断是否已安装，不实际 import
+    2) 缺失时优先从本地 wheel 目录离线安装（BOOTSTRAP_WHEEL_DIR，默认脚本同级 wheelhouse/）
+    3) 本地没有再走镜像源（短超时，断网时尽快失败而不是长时间卡住）
+    """
+
+    INDEX_URL = "https://pypi.tuna.tsinghua.edu.cn/simple"
+
+    @staticmethod
+    def is_available(import_name: str) -> bool:
+        try:
+            return importlib.util.find_spec(import_name) is not None
+        except (ImportError, ValueError):
+            return False
+
+    @staticmethod
+    def wheel_path() -> Path:
+        """本地 wheel 目录位置（不检查是否存在）；后端离线安装（Wheelhouse）共用同一目录。"""
+        raw = os.getenv("BOOTSTRAP_WHEEL_DIR", "").strip()
+        return Path(raw).expanduser() if raw else Path(__file__).resolve().parent / "wheelhouse"
+
+    @staticmethod
+    def wheel_dir() -> Optional[Path]:
+        d = Bootstrapper.wheel_path()
+        return d if d.is_dir() else None
 
     @staticmethod
     def ensure_library_installed(pip_name: str, import_name: str = None, index_url: str = None):
         mod = import_name or pip_name
+        if Bootstrapper.is_available(mod):
+            return
+
+        wheel_dir = Bootstrapper.wheel_dir()
+        if wheel_dir is not None:
+            ConsolePrinter.print("Bootstrap", f"Installing {pip_name} from {wheel_dir} (offline)...")
+            cmd = [sys.executable, "-m", "pip", "install", "--no-index", "--find-links", str(wheel_dir), pip_name]
+            if subprocess.run(cmd).returncode == 0:
+                importlib.invalidate_caches()
+                return
+            ConsolePrinter.print("Bootstrap", f"{pip_name} not found in {wheel_dir}, trying package index...")
+
+        ConsolePrinter.print("Bootstrap", f"Installing {pip_name}...")
+        cmd = [sys.executable, "-m", "pip", "install", "--timeout", "15", "--retries", "1", pip_name]
+        if index_url:
+            cmd += ["-i", index_url]
+        subprocess.run(cmd, check=True)
+        importlib.invalidate_caches()
+
+
+class LazyModule:
+    """
+    延迟导入的三方模块：首次访问属性时才检查/安装并 import。
+    启动器本身 import 时不触发任何安装或三方库加载。
+    """
+
+    def __init__(self, import_name: str, pip_name: str = None):
+        self._import_name = import_name
+        self._pip_name = pip_name or import_name
+        self._mod = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._mod is None:
+            with self._lock:
+                if self._mod is None:
+                    Bootstrapper.ensure_library_installed(
+                        self._pip_name, import_name=self._import_name, index_url=Bootstrapper.INDEX_URL
+                    )
+                    self._mod = importlib.import_module(self._import_name)
+        return self._mod
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+
+psutil = LazyModule("psutil")
+dotenv = LazyModule("dotenv", pip_name="python-dotenv")
+
+
+class ImportProfiler:
+    """
+    启动器自身 import 开销：用 `python -X importtime` 在子进程中测量 `import mma_launcher`，
+    汇总累计耗时与最重的模块，并与 IMPORT_BUDGET_MS（默认 150ms）比较。
+    """
+
+    name = "ImportProfiler"
+    _LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+    @staticmethod
+    def measure(script: Path) -> tuple[float, list]:
+        """返回 (模块累计 ms, [(self_ms, 模块名), ...] 按自身耗时降序)。"""
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {script.stem}"],
+            cwd=str(script.parent),
+            capture_output=True,
+            text=True,
+        )
+        rows = []  # (缩进, self_us, cum_us, 模块名)；-X importtime 先输出子模块，再输出父模块
+        for line in proc.stderr.splitlines():
+            m = ImportProfiler._LINE_RE.match(line)
+            if m:
+                rows.append((len(m.group(3)), int(m.group(1)), int(m.group(2)), m.group(4)))
+        idx = next((i for i, r in enumerate(rows) if r[3] == script.stem), None)
+        if idx is None:
+            return 0.0, []
+        # 只统计 mma_launcher 子树：向前回溯到缩进不再更深为止（排除 site 等解释器启动期导入）
+        start = idx
+        while start > 0 and rows[start - 1][0] > rows[idx][0]:
+            start -= 1
+        entries = sorted(((r[1] / 1000.0, r[3]) for r in rows[start : idx + 1]), reverse=True)
+        return rows[idx][2] / 1000.0, entries
+
+    @staticmethod
+    def report(budget_ms: float = None, top: int = 10) -> bool:
+        if budget_ms is None:
+            budget_ms = float(os.getenv("IMPORT_BUDGET_MS", "150"))
+        total_ms, entries = ImportProfiler.measure(Path(__file__).resolve())
+        ConsolePrinter.print(ImportProfiler.name, f"import cost: {total_ms:.1f}ms (budget {budget_ms:.0f}ms)")
+        for self_ms, mod in entries[:top]:
+            ConsolePrinter.print(ImportProfiler.name, f"  {self_ms:8.2f}ms  {mod}")
+        ok = total_ms <= budget_ms
+        if not ok:
+            ConsolePrinter.print(ImportProfiler.name, "Import budget exceeded")
+        return ok
+
+
+class StartupProfiler:
+    """
+    启动时间线（--profile-startup）：
+    1) span(name) 记录每个阶段/子进程的 wall、本线程 CPU、子进程 CPU（os.times，Windows 上恒为 0）
+    2) finish() 写出 .mma_profile/timeline-*.json，并向 history.jsonl 追加一行各阶段耗时汇总
+    3) report() 用最近一次与历史滚动中位数比较，标出回退的阶段
+    未启用时 span() 为空操作。
+    """
+
+    name = "Profiler"
+    DIR_NAME = ".mma_profile"
+
+    def __init__(self):
+        self.enabled = False
+        self.out_dir: Optional[Path] = None
+        self.spans: list[dict] = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def enable(self, project_root: Path):
+        self.enabled = True
+        self.out_dir = project_root / self.DIR_NAME
+        self._t0 = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name: str, kind: str = "phase"):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        cpu0 = time.thread_time()
+        ch0 = os.times()
+        ok = True
         try:
-            __import__(mod)
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            ch1 = os.times()
+            rec = {
+                "name": name,
+                "kind": kind,
+                "thread": threading.current_thread().name,
+                "start": round(start - self._t0, 4),
+                "wall": round(time.perf_counter() - start, 4),
+                "cpu": round(time.thread_time() - cpu0, 4),
+                "child_cpu": round(
+                    (ch1.children_user - ch0.children_user) + (ch1.children_system - ch0.children_system), 4
+                ),
+                "ok": ok,
+            }
+            with self._lock:
+                self.spans.append(rec)
+
+    def finish(self):
+        if not self.enabled or self.out_dir is None:
             return
-        except ImportError:
-            ConsolePrinter.print("Bootstrap", f"Installing {pip_name}...")
-            cmd = [sys.executable, "-m", "pip", "install", pip_name]
-            if index_url:
-                cmd += ["-i", index_url]
-            subprocess.run(cmd, check=True)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        total = time.perf_counter() - self._t0
+        timeline = self.out_dir / f"timeline-{stamp}.json"
+        with self._lock:
+            spans = sorted(self.spans, key=lambda r: r["start"])
+        timeline.write_text(
+            json.dumps({"at": stamp, "total": round(total, 4), "spans": spans}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        # 同名阶段（如多次 wait_until_open）累加后作为汇总行
+        phases: dict[str, float] = {}
+        for r in spans:
+            phases[r["name"]] = round(phases.get(r["name"], 0.0) + r["wall"], 4)
+        with open(self.out_dir / "history.jsonl", "a", encoding="utf-8") as fp:
+            fp.write(json.dumps({"at": stamp, "total": round(total, 4), "phases": phases}, ensure_ascii=False) + "\n")
+        ConsolePrinter.print(self.name, f"Startup took {total:.2f}s; timeline written to {timeline}")
+
+    @staticmethod
+    def report(project_root: Path, window: int = None, threshold: float = None, min_delta: float = 0.2) -> bool:
+        """最近一次 vs 之前 window 次的中位数；超过 (1+threshold) 倍且绝对差 >= min_delta 秒视为回退。"""
+        window = window or int(os.getenv("PROFILE_HISTORY_WINDOW", "10"))
+        threshold = threshold if threshold is not None else float(os.getenv("PROFILE_REGRESSION_PCT", "20")) / 100
+        hist_file = project_root / StartupProfiler.DIR_NAME / "history.jsonl"
+        rows = []
+        try:
+            for line in hist_file.read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    rows.append(json.loads(line))
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            ConsolePrinter.print(StartupProfiler.name, f"Corrupt history file {hist_file}: {e}")
+            return False
+        if len(rows) < 2:
+            ConsolePrinter.print(StartupProfiler.name, f"Need at least 2 profiled runs in {hist_file}")
+            return True
 
+        latest, prev = rows[-1], rows[-1 - window : -1]
+        regressed = []
+        names = ["total"] + sorted(latest["phases"])
+        for ph in names:
+            cur = latest["total"] if ph == "total" else latest["phases"][ph]
+            samples = [r["total"] if ph == "total" else r["phases"].get(ph) for r in prev]
+            samples = [v for v in samples if v is not None]
+            if not samples:
+                ConsolePrinter.print(StartupProfiler.name, f"{ph:<32} {cur:8.2f}s  (new)")
+                continue
+            med = statistics.median(samples)
+            flag = cur > med * (1 + threshold) and cur - med >= min_delta
+            if flag:
+                regressed.append(ph)
+            ConsolePrinter.print(
+                StartupProfiler.name,
+                f"{ph:<32} {cur:8.2f}s  median {med:8.2f}s  {'REGRESSED' if flag else 'ok'}",
+            )
+        if regressed:
+            ConsolePrinter.print(StartupProfiler.name, f"Regressed phases: {', '.join(regressed)}")
+        return not regressed
 
-# 初始化输出 -> 三方库确保
-OutputConfigurator.configure()
-Bootstrapper.ensure_library_installed(
-    "python-dotenv", import_name="dotenv", index_url="https://pypi.tuna.tsinghua.edu.cn/simple"
-)
-Bootstrapper.ensure_library_installed(
-    "psutil", import_name="psutil", index_url="https://pypi.tuna.tsinghua.edu.cn/simple"
-)
 
-# 其余导入在安装后进行
-import psutil
+PROFILER = StartupProfiler()
 
 
 # ========= Windows 原生弹窗 =========
@@ -68,9 +495,7 @@ class Dialogs:
     2) ask_directory: Shell 文件夹选择对话框（新样式）
     """
 
-    import os as _pyos
-
-    _is_win = _pyos.name == "nt"
+    _is_win = os.name == "nt"
 
     @staticmethod
     def _owner_hwnd():
@@ -223,21 +648,191 @@ class Dialogs:
 
 
 # ========= 配置管理 =========
-from dotenv import load_dotenv, set_key, dotenv_values
+class EnvFileCache:
+    """按 (mtime_ns, size) 缓存 .env 解析结果：同一文件未变化时整个启动过程只解析一次。"""
+
+    _cache: dict = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def load(path: Path, force: bool = False) -> dict:
+        key = str(path)
+        try:
+            st = os.stat(path)
+            sig = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return {}
+        with EnvFileCache._lock:
+            hit = EnvFileCache._cache.get(key)
+            if not force and hit and hit[0] == sig:
+                return dict(hit[1])
+        try:
+            values = dict(dotenv.dotenv_values(path))
+        except Exception:
+            values = {}
+        with EnvFileCache._lock:
+            EnvFileCache._cache[key] = (sig, values)
+        return dict(values)
+
+
+class LayeredConfig:
+    """
+    分层配置（优先级从低到高，后者覆盖前者）：
+      process  : 启动器启动时的进程环境快照（之后对 os.environ 的修改不影响它）
+      root     : 项目根 .env
+      backend  : backend/.env.dev，仅注入后端子进程
+      frontend : frontend/.env.development，由 Vite 自行加载，这里只解析（供比对使用），不注入
+    service_env() 按上述顺序为每个服务组装独立的环境字典：process 层只取 BASE_KEYS / BASE_PREFIXES
+    （系统运行所需的路径、临时目录、代理、语言等）以及 SERVICE_ENV_PASSTHROUGH（逗号分隔）列出的键，
+    不再整份克隆启动器环境；启动器自身向 os.environ 写入的内容（根 .env 注入等）也不会泄漏到子进程。
+    """
+
+    BASE_KEYS = frozenset(
+        (
+            "PATH PATHEXT SYSTEMROOT SYSTEMDRIVE WINDIR COMSPEC TEMP TMP "
+            "USERPROFILE USERNAME USERDOMAIN HOMEDRIVE HOMEPATH HOME "
+            "APPDATA LOCALAPPDATA PROGRAMDATA PROGRAMFILES PROGRAMFILES(X86) PROGRAMW6432 "
+            "COMMONPROGRAMFILES COMMONPROGRAMFILES(X86) COMPUTERNAME OS "
+            "NUMBER_OF_PROCESSORS PROCESSOR_ARCHITECTURE PROCESSOR_IDENTIFIER "
+            "LANG LC_ALL PYTHONIOENCODING PYTHONUTF8 "
+            "HTTP_PROXY HTTPS_PROXY NO_PROXY ALL_PROXY SSL_CERT_FILE REQUESTS_CA_BUNDLE"
+        ).split()
+    )
+    BASE_PREFIXES = ("UV_", "NPM_CONFIG_", "PNPM_", "NODE_", "COREPACK_")
+
+    def __init__(self, project_root: Path):
+        self.project_root = project_root
+        self.process = dict(os.environ)
+        self.files = {
+            "root": project_root / ".env",
+            "backend": project_root / "backend" / ".env.dev",
+            "frontend": project_root / "frontend" / ".env.development",
+        }
+
+    def layer(self, name: str) -> dict:
+        if name == "process":
+            return dict(self.process)
+        return {k: v for k, v in EnvFileCache.load(self.files[name]).items() if v is not None}
+
+    def base_env(self) -> dict:
+        """process 层中允许传给子进程的部分（Windows 环境变量不区分大小写，按大写比较）。"""
+        extra = {k.strip().upper() for k in os.getenv("SERVICE_ENV_PASSTHROUGH", "").split(",") if k.strip()}
+        return {
+            k: v
+            for k, v in self.process.items()
+            if k.upper() in self.BASE_KEYS or k.upper() in extra or k.upper().startswith(self.BASE_PREFIXES)
+        }
+
+    def service_env(self, service: str, overrides: dict = None) -> dict:
+        env = self.base_env()
+        env.update(self.layer("root"))
+        if service == "backend":
+            env.update(self.layer("backend"))
+        if overrides:
+            env.update(overrides)
+        return env
+
+
+class FileLock:
+    """
+    跨进程文件锁（O_CREAT|O_EXCL 锁文件）：同一份代码目录下多个启动器不会交错写同一文件。
+    1) Windows 上锁文件处于"删除挂起"状态时创建会报 PermissionError，与 FileExistsError 一样按占用处理
+    2) 每次重试都检查超时并休眠，不会空转
+    3) 持锁超过 stale_after 秒的锁文件视为残留（进程崩溃）：先改名为唯一文件名再删除，
+       改名只有一个进程能成功，不会误删别人刚创建的新锁
+    """
+
+    name = "FileLock"
+
+    def __init__(self, path: Path, timeout: float = 10.0, stale_after: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._fd = os.open(str(self.path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(self._fd, str(os.getpid()).encode("ascii"))
+                return self
+            except (FileExistsError, PermissionError):
+                if self._take_over_stale():
+                    continue
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for lock {self.path}")
+                time.sleep(0.05)
+
+    def _take_over_stale(self) -> bool:
+        try:
+            if time.time() - self.path.stat().st_mtime <= self.stale_after:
+                return False
+            grave = self.path.with_name(f"{self.path.name}.stale-{os.getpid()}-{secrets.token_hex(4)}")
+            os.replace(self.path, grave)
+        except OSError:
+            return False
+        # 改名与 stat 之间锁可能已被他人重建：改到手的若不再陈旧，说明抢到的是新锁，放回去
+        try:
+            if time.time() - grave.stat().st_mtime <= self.stale_after:
+                try:
+                    os.link(grave, self.path)
+                except OSError:
+                    pass
+            grave.unlink(missing_ok=True)
+        except OSError:
+            pass
+        return True
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        try:
+            self.path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        return False
 
 
 class ConfigManager:
+    """
+    根目录 .env 的读写：
+    1) 读：dotenv 解析，mtime/size 未变时不重复解析
+    2) 写：transaction() 内的多次 set 只在内存中缓冲，退出时一次性提交；
+       提交在文件锁内重新读取文件、逐行替换（保留注释与顺序，新键追加到末尾），写临时文件后 os.replace
+    3) 事务外的 set 等价于只含一个键的事务
+    """
+
+    _KEY_RE = re.compile(r"^(\s*(?:export\s+)?)([A-Za-z_][A-Za-z0-9_.]*)(\s*=)")
+
     def __init__(self, env_file: Path):
         self.env_file = env_file
         self._file_values = {}
+        self._loaded_sig = None
+        self._txn: Optional[dict] = None
+        self._txn_lock = threading.RLock()
         self.reload()
 
-    def reload(self):
-        load_dotenv(dotenv_path=self.env_file, override=True)
+    def _file_sig(self):
         try:
-            self._file_values = dotenv_values(self.env_file) if self.env_file.exists() else {}
-        except Exception:
-            self._file_values = {}
+            st = self.env_file.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def reload(self, force: bool = False):
+        # .env 未变化（mtime/size 相同）时不重复解析；解析一次后同时用于 os.environ 与 _file_values
+        sig = self._file_sig()
+        if not force and sig is not None and sig == self._loaded_sig:
+            return
+        self._loaded_sig = sig
+        self._file_values = EnvFileCache.load(self.env_file, force=force)
+        # 根 .env 也是启动器自身的配置层（LOG_FILTER、WARM_START 等开关通过 os.getenv 读取）：覆盖进程环境，
+        # 与旧的 load_dotenv(override=True) 一致；子进程环境由 LayeredConfig 从注入前的快照组装，不受影响
+        for k, v in self._file_values.items():
+            if v is not None:
+                os.environ[k] = v
 
     def get(self, key: str, default: str = "") -> str:
         v = os.getenv(key)
@@ -246,111 +841,1656 @@ class ConfigManager:
         return self._file_values.get(key, default)
 
     def set(self, key: str, value: str):
-        set_key(self.env_file, key, value, quote_mode="never")
-        os.environ[key] = value
+        with self._txn_lock:
+            os.environ[key] = value
+            if self._txn is not None:
+                self._txn[key] = value
+                return
+            self._commit({key: value})
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """批量写入：块内的 set 在退出时一次提交；块内异常则丢弃未提交的改动（os.environ 已更新的部分保留）。"""
+        with self._txn_lock:
+            if self._txn is not None:  # 嵌套事务并入外层
+                yield self
+                return
+            self._txn = {}
+            try:
+                yield self
+                if self._txn:
+                    self._commit(self._txn)
+            finally:
+                self._txn = None
+
+    def _commit(self, changes: dict):
+        with FileLock(self.env_file.with_name(self.env_file.name + ".lock")):
+            try:
+                raw = self.env_file.read_bytes().decode("utf-8")
+            except FileNotFoundError:
+                raw = ""
+            newline = "\r\n" if "\r\n" in raw else "\n"
+            lines = raw.splitlines()
+            matched = set()
+            for i, line in enumerate(lines):
+                m = self._KEY_RE.match(line)
+                if m and m.group(2) in changes:
+                    # 重复出现的键全部改写（dotenv 以最后一次出现为准，与 set_key 行为一致）
+                    lines[i] = f"{m.group(1)}{m.group(2)}={changes[m.group(2)]}"
+                    matched.add(m.group(2))
+            lines += [f"{k}={v}" for k, v in changes.items() if k not in matched]
+            text = newline.join(lines) + newline
+
+            tmp = self.env_file.with_name(f"{self.env_file.name}.{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8", newline="") as fp:
+                fp.write(text)
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(tmp, self.env_file)
+        self._file_values.update(changes)
+        self._loaded_sig = self._file_sig()
 
     def exists(self, key: str) -> bool:
         return (os.getenv(key) not in (None, "")) or (key in self._file_values and self._file_values[key] != "")
 
 
+class LaunchManifest:
+    """
+    热启动清单（项目根目录 .mma_launch_state.json）：
+    1) 记录每项预检的结果 + 其输入指纹（文件 mtime/size、PATH 等）
+    2) 下次启动指纹未变 -> 直接复用结果，跳过目录校验 / npm --version / uv 定位等
+    3) WARM_START=0 可关闭（每次都完整检查，但仍会刷新清单）
+    """
+
+    name = "LaunchManifest"
+    FILE_NAME = ".mma_launch_state.json"
+    VERSION = 1
+
+    def __init__(self, project_root: Path):
+        self.path = project_root / self.FILE_NAME
+        self.enabled = os.getenv("WARM_START", "1").strip().lower() not in ("0", "false", "no")
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._checks: dict = {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") == self.VERSION:
+                self._checks = data.get("checks", {})
+        except Exception:
+            self._checks = {}
+
+    @staticmethod
+    def fingerprint(*paths, extra=None) -> list:
+        """文件指纹：[路径, mtime_ns, size]；不存在的文件记为 None，extra 用于附加非文件输入。"""
+        fp = []
+        for p in paths:
+            try:
+                st = os.stat(p)
+                fp.append([str(p), st.st_mtime_ns, st.st_size])
+            except OSError:
+                fp.append([str(p), None, None])
+        if extra is not None:
+            fp.append(extra)
+        return fp
+
+    def lookup(self, check: str, fingerprint: list):
+        """指纹一致时返回缓存结果，否则返回 None。"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            rec = self._checks.get(check)
+        if rec and rec.get("fp") == fingerprint:
+            return rec.get("result")
+        return None
+
+    def previous(self, check: str):
+        """返回上次记录的结果（不校验指纹），供需要由结果反推指纹的检查使用。"""
+        with self._lock:
+            rec = self._checks.get(check)
+        return rec.get("result") if rec else None
+
+    def record(self, check: str, fingerprint: list, result):
+        with self._lock:
+            self._checks[check] = {"fp": fingerprint, "result": result, "at": time.strftime("%Y-%m-%d %H:%M:%S")}
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {"version": self.VERSION, "checks": self._checks}
+            self._dirty = False
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            ConsolePrinter.print(self.name, f"Failed to write {self.path}: {e}")
+
+
 # ========= 组件 =========
 class CacheCleaner:
+    """
+    单次 os.scandir 遍历清理 Python 字节码缓存：
+    1) 在进入之前剪掉不需要扫描的目录（node_modules / 虚拟环境 / .git / uv、pnpm 缓存）
+    2) 一次遍历同时收集 __pycache__ 目录与散落的 *.pyc / *.pyo
+    3) 通过线程池并行删除，报告遍历条目数、释放字节数与耗时
+    模式（CACHE_CLEAN_MODE）：
+    - stale（默认）：只删除孤立（源文件已不存在）或过期（pyc 头部记录的源 mtime/size 或哈希不匹配）的 pyc，
+      其余保留，避免每次启动后端都从零编译 backend/app
+    - all：删除全部 __pycache__（旧行为）
+    散落在源码旁的 *.pyc / *.pyo（非 __pycache__）在源文件缺失时仍会被 Python 直接导入，两种模式下都删除。
+    """
+
     name = "CacheCleaner"
+    PRUNE_DIRS = {
+        "node_modules",
+        ".venv",
+        "venv",
+        ".git",
+        ".pnpm-store",
+        ".uv-cache",
+        ".mma_trash",
+        ".mma_venv_store",
+    }
+    BYTECODE_SUFFIXES = (".pyc", ".pyo")
+
+    @staticmethod
+    def _mode() -> str:
+        mode = os.getenv("CACHE_CLEAN_MODE", "stale").strip().lower()
+        return mode if mode in ("stale", "all") else "stale"
 
     @staticmethod
-    def clear(project_root: Path):
-        def _skip_venv(p: Path) -> bool:
-            parts = {part.lower() for part in p.parts}
-            return ".venv" in parts or "venv" in parts
+    def stale_reason(pyc_path: str) -> Optional[str]:
+        """
+        判断 __pycache__ 下的 pyc 是否需要删除；返回原因，仍有效则返回 None。
+        pyc 头部（PEP 552）：magic(4) + flags(4) + [源 mtime(4) + 源 size(4) | 源哈希(8)]
+        """
+        try:
+            source = importlib.util.source_from_cache(pyc_path)
+        except ValueError:
+            return "unrecognized name"
+        try:
+            st = os.stat(source)
+        except OSError:
+            return "orphaned"
+        try:
+            with open(pyc_path, "rb") as fp:
+                header = fp.read(16)
+        except OSError:
+            return "unreadable"
+        if len(header) < 16:
+            return "bad header"
+
+        # 仅当 pyc 属于当前解释器时才能校验 magic 与哈希
+        same_tag = os.path.basename(pyc_path).split(".")[1:2] == [sys.implementation.cache_tag]
+        if same_tag and header[:4] != importlib.util.MAGIC_NUMBER:
+            return "magic mismatch"
+        flags = int.from_bytes(header[4:8], "little")
+        if flags & 0b1:
+            # 基于哈希的 pyc：unchecked 的不会被解释器校验，无法验证时一律视为过期
+            if not same_tag:
+                return "hash-based (other interpreter)"
+            try:
+                with open(source, "rb") as fp:
+                    if importlib.util.source_hash(fp.read()) != header[8:16]:
+                        return "stale (hash)"
+            except OSError:
+                return "orphaned"
+            return None
+        mtime = int.from_bytes(header[8:12], "little")
+        size = int.from_bytes(header[12:16], "little")
+        if mtime != (int(st.st_mtime) & 0xFFFFFFFF) or size != (st.st_size & 0xFFFFFFFF):
+            return "stale (mtime/size)"
+        return None
 
-        removed = 0
-        for d in project_root.rglob("__pycache__"):
-            if d.is_dir() and not _skip_venv(d):
-                shutil.rmtree(d, ignore_errors=True)
-                removed += 1
-        for pattern in ("*.pyc", "*.pyo"):
-            for f in project_root.rglob(pattern):
-                if not _skip_venv(f):
+    @staticmethod
+    def _scan_pycache(path: str, targets: list) -> int:
+        visited = 0
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    visited += 1
+                    if not entry.name.endswith(CacheCleaner.BYTECODE_SUFFIXES):
+                        continue
                     try:
-                        f.unlink(missing_ok=True)
-                        removed += 1
-                    except Exception:
-                        pass
-        ConsolePrinter.print(CacheCleaner.name, f"Removed {removed} Python cache items from {project_root}")
+                        reason = CacheCleaner.stale_reason(entry.path)
+                        if reason:
+                            targets.append((entry.path, False, entry.stat(follow_symlinks=False).st_size, reason))
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return visited
 
+    @staticmethod
+    def _scan(project_root: Path, mode: str = "all") -> tuple[list, int]:
+        """返回 ([(路径, 是否目录, 文件大小, 原因)], 遍历条目数)。"""
+        targets = []
+        visited = 0
+        stack = [str(project_root)]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    visited += 1
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            name = entry.name.lower()
+                            if name == "__pycache__":
+                                if mode == "stale":
+                                    visited += CacheCleaner._scan_pycache(entry.path, targets)
+                                else:
+                                    targets.append((entry.path, True, 0, "cache dir"))
+                            elif name not in CacheCleaner.PRUNE_DIRS:
+                                stack.append(entry.path)
+                        elif entry.name.endswith(CacheCleaner.BYTECODE_SUFFIXES):
+                            size = entry.stat(follow_symlinks=False).st_size
+                            targets.append((entry.path, False, size, "loose bytecode"))
+                    except OSError:
+                        continue
+        return targets, visited
 
-class PathPicker:
-    name = "PathPicker"
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        total = 0
+        for cur, _dirs, files in os.walk(path):
+            for f in files:
+                try:
+                    total += os.lstat(os.path.join(cur, f)).st_size
+                except OSError:
+                    pass
+        return total
 
     @staticmethod
-    def _check_path_valid(path: str, required_files: list) -> bool:
-        p = Path(path)
-        if not p.exists():
-            return False
-        return all((p / f).exists() for f in required_files)
+    def _remove(target: tuple, trash: "TrashBin" = None) -> int:
+        """删除单个目标，返回释放的字节数（失败返回 -1）。给定 trash 时目录改为原子移入回收站。"""
+        path, is_dir, size, _reason = target
+        try:
+            if is_dir:
+                size = CacheCleaner._dir_size(path)
+                if trash is None or not trash.move(path):
+                    shutil.rmtree(path)
+            else:
+                os.unlink(path)
+            return size
+        except FileNotFoundError:
+            return 0
+        except OSError:
+            return -1
 
     @staticmethod
-    def pick_and_validate(cfg: ConfigManager, env_var: str, title: str, required_files: list) -> str:
-        current = cfg.get(env_var, "")
-        if current and PathPicker._check_path_valid(current, required_files):
-            ConsolePrinter.print(PathPicker.name, f"{env_var} already set: {current}")
-            return current
+    def _fmt_bytes(n: int) -> str:
+        for unit in ("B", "KB", "MB", "GB"):
+            if n < 1024 or unit == "GB":
+                return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+            n /= 1024
+        return f"{n}B"
 
-        while True:
-            chosen = Dialogs.ask_directory(title)
-            if not chosen:
-                ans = Dialogs.yes_no_cancel(
-                    "未选择目录", f"没有选择任何目录。\n是否重试选择 {env_var} ？", timeout_sec=0
-                )
-                if ans == "yes":
-                    continue
-                sys.exit(1)
+    @staticmethod
+    def clear(project_root: Path, mode: str = None, dry_run: bool = False, trash: "TrashBin" = None) -> dict:
+        t0 = time.perf_counter()
+        mode = mode or CacheCleaner._mode()
+        targets, visited = CacheCleaner._scan(project_root, mode)
+        if dry_run:
+            for path, is_dir, size, reason in targets:
+                rel = os.path.relpath(path, project_root)
+                ConsolePrinter.print(CacheCleaner.name, f"[dry-run] {'dir ' if is_dir else 'file'} {rel} ({reason})")
+            ConsolePrinter.print(
+                CacheCleaner.name,
+                f"[dry-run] mode={mode}: {len(targets)} items would be removed; visited {visited} entries "
+                f"in {time.perf_counter() - t0:.2f}s",
+            )
+            return {"removed": 0, "failed": 0, "bytes": 0, "visited": visited, "would_remove": len(targets)}
+        freed = failed = 0
+        if targets:
+            with ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 2) * 2), thread_name_prefix="clean") as pool:
+                for r in pool.map(lambda t: CacheCleaner._remove(t, trash), targets):
+                    if r < 0:
+                        failed += 1
+                    else:
+                        freed += r
+        elapsed = time.perf_counter() - t0
+        removed = len(targets) - failed
+        msg = (
+            f"Removed {removed} {'stale ' if mode == 'stale' else ''}Python cache items "
+            f"({CacheCleaner._fmt_bytes(freed)}) from {project_root}; "
+            f"visited {visited} entries in {elapsed:.2f}s"
+        )
+        if failed:
+            msg += f", {failed} failed"
+        ConsolePrinter.print(CacheCleaner.name, msg)
+        return {"removed": removed, "failed": failed, "bytes": freed, "visited": visited, "elapsed": elapsed}
 
-            if PathPicker._check_path_valid(chosen, required_files):
-                cfg.set(env_var, chosen)
-                ConsolePrinter.print(PathPicker.name, f"Set {env_var} to {chosen}")
-                return chosen
-            else:
-                ans = Dialogs.yes_no_cancel(
-                    "目录无效", f"目录缺少：{', '.join(required_files)}\n是否重新选择？", timeout_sec=0
-                )
-                if ans != "yes":
-                    sys.exit(1)
 
+class TrashBin:
+    """
+    延迟删除：
+    1) move() 把目录原子 rename 到项目根 .mma_trash/<会话>/ 下（同盘 rename，瞬间完成）
+    2) reap() 真正删除回收站内容；由 spawn_worker() 启动的脱离控制台、低优先级子进程执行，
+       或在下次启动时回收，不占用启动/退出路径
+    3) hold=True 的会话由启动器进程内自行删除（如 ParallelDeleter）：会话目录内放 BUSY_MARKER，
+       会话名中的 PID 仍存活时 reap() 跳过它，避免两个删除者同时处理同一棵树；删完后 release()
+    """
 
-class EnvFileManager:
-    name = "EnvFileManager"
+    name = "TrashBin"
+    DIR_NAME = ".mma_trash"
+    BUSY_MARKER = ".busy"
+
+    def __init__(self, project_root: Path, hold: bool = False):
+        self.root = project_root / self.DIR_NAME
+        self.session = self.root / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.hold = hold
+        self._lock = threading.Lock()
+        self._n = 0
+        if hold:
+            # 同一秒内的同进程会话需区分开，否则 release 会删掉别人的标记
+            self.session = self.session.with_name(f"{self.session.name}-{secrets.token_hex(2)}")
+
+    def move(self, path) -> Optional[Path]:
+        """原子移入回收站，返回新位置；失败（如文件被占用）返回 None。"""
+        with self._lock:
+            self._n += 1
+            dest = self.session / f"{self._n:05d}-{os.path.basename(path)}"
+        try:
+            self.session.mkdir(parents=True, exist_ok=True)
+            if self.hold:
+                # 标记先于 rename 写入：后台 reap 任何时刻看到的都是已占用的会话
+                (self.session / self.BUSY_MARKER).touch()
+            os.rename(path, dest)
+            return dest
+        except OSError:
+            return None
+
+    def release(self):
+        """进程内删除结束：移除占用标记；会话已空则一并删除，有残留则留给下次 reap。"""
+        try:
+            (self.session / self.BUSY_MARKER).unlink(missing_ok=True)
+            self.session.rmdir()
+        except OSError:
+            pass
 
     @staticmethod
-    def copy_envs(project_root: Path):
-        backend_env = project_root / "backend" / ".env.dev"
-        frontend_env = project_root / "frontend" / ".env.development"
-        backend_env_example = project_root / "backend" / ".env.dev.example"
-        frontend_env_example = project_root / "frontend" / ".env.example"
+    def _held(session: Path) -> bool:
+        """会话带占用标记且所属启动器进程仍在运行。"""
+        if not (session / TrashBin.BUSY_MARKER).exists():
+            return False
+        m = re.match(r"^\d{8}-\d{6}-(\d+)", session.name)
+        if m is None:
+            return False
+        try:
+            return psutil.pid_exists(int(m.group(1)))
+        except Exception:
+            return True
 
-        if not backend_env.exists():
-            if backend_env_example.exists():
-                shutil.copy(backend_env_example, backend_env)
-                ConsolePrinter.print(EnvFileManager.name, f"Created {backend_env} from {backend_env_example}")
-            else:
-                ConsolePrinter.print(
-                    EnvFileManager.name, f"Backend .env.dev.example not found at {backend_env_example}"
-                )
-                sys.exit(1)
-        else:
-            ConsolePrinter.print(EnvFileManager.name, f"Backend .env already exists at {backend_env}")
+    @property
+    def used(self) -> bool:
+        return self._n > 0
 
-        if not frontend_env.exists():
-            if frontend_env_example.exists():
-                shutil.copy(frontend_env_example, frontend_env)
-                ConsolePrinter.print(EnvFileManager.name, f"Created {frontend_env} from {frontend_env_example}")
-            else:
+    @staticmethod
+    def pending(project_root: Path) -> bool:
+        trash_root = project_root / TrashBin.DIR_NAME
+        try:
+            return any(trash_root.iterdir())
+        except OSError:
+            return False
+
+    @staticmethod
+    def reap(project_root: Path) -> tuple[int, int]:
+        """删除回收站内所有会话目录，返回 (成功数, 失败数)。"""
+        trash_root = project_root / TrashBin.DIR_NAME
+        done = failed = 0
+        try:
+            sessions = list(trash_root.iterdir())
+        except OSError:
+            return 0, 0
+        for d in sessions:
+            if TrashBin._held(d):
+                continue
+            shutil.rmtree(d, ignore_errors=True)
+            if d.exists():
+                failed += 1
+            else:
+                done += 1
+        try:
+            trash_root.rmdir()
+        except OSError:
+            pass
+        return done, failed
+
+    @staticmethod
+    def spawn_worker(project_root: Path, task: str) -> bool:
+        """以脱离控制台的低优先级子进程执行后台清理（task: exit / trash），启动器可立即退出。"""
+        cmd = [sys.executable, str(Path(__file__).resolve()), "--background-cleanup", task]
+        kwargs = dict(
+            cwd=str(project_root), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        if os.name == "nt":
+            DETACHED_PROCESS = 0x00000008
+            IDLE_PRIORITY_CLASS = 0x00000040
+            kwargs["creationflags"] = DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP | IDLE_PRIORITY_CLASS
+        else:
+            kwargs["start_new_session"] = True
+        try:
+            subprocess.Popen(cmd, **kwargs)
+            return True
+        except OSError as e:
+            ConsolePrinter.print(TrashBin.name, f"Failed to spawn background cleanup: {e}")
+            return False
+
+    @staticmethod
+    def run_worker(project_root: Path, task: str):
+        """后台清理子进程入口。"""
+        if hasattr(os, "nice"):
+            try:
+                os.nice(10)
+            except OSError:
+                pass
+        if task == "exit":
+            CacheCleaner.clear(project_root)
+        TrashBin.reap(project_root)
+
+
+class ParallelDeleter:
+    """
+    并行删除大目录树（如 pnpm 的 node_modules：大量符号链接 / 硬链接 / junction）：
+    1) 把根目录及其中的大目录（如 .pnpm/）展开成一批删除单元，交给多个工作线程
+    2) 链接与 junction 只删除链接本身；只读文件先去掉只读属性再重试
+    3) 按间隔打印进度，结束时汇总失败项（不再 ignore_errors 静默留下半棵树）
+    """
+
+    name = "Deleter"
+
+    def __init__(self, root: Path, label: str, workers: int = None, interval: float = 2.0):
+        self.root = Path(root)
+        self.label = label
+        self.workers = workers or min(8, (os.cpu_count() or 2))
+        self.interval = interval
+        self.failures: list[tuple[str, str]] = []
+        self._lock = threading.Lock()
+        self._done = 0
+
+    @staticmethod
+    def _is_link(path: str) -> bool:
+        return os.path.islink(path) or (hasattr(os.path, "isjunction") and os.path.isjunction(path))
+
+    def _units(self) -> list[str]:
+        """根目录下的条目；子条目多于 64 个的真实目录再展开一层，使工作量能分摊到各线程。"""
+        units, expand = [], [str(self.root)]
+        for depth in range(2):
+            nxt = []
+            for d in expand:
+                try:
+                    entries = list(os.scandir(d))
+                except OSError as e:
+                    self._fail(d, e)
+                    continue
+                for e in entries:
+                    if depth == 0 and e.is_dir(follow_symlinks=False) and not self._is_link(e.path):
+                        nxt.append(e.path)
+                    else:
+                        units.append(e.path)
+            if depth == 0:
+                big = []
+                for d in nxt:
+                    try:
+                        many = sum(1 for _ in os.scandir(d)) > 64
+                    except OSError:
+                        many = False
+                    (big if many else units).append(d)
+                expand = big
+        return units
+
+    def _fail(self, path: str, exc: BaseException):
+        if isinstance(exc, FileNotFoundError):
+            return  # 已被其它清理进程删除
+        with self._lock:
+            self.failures.append((path, f"{type(exc).__name__}: {exc}"))
+
+    def _onerror(self, func, path, exc_info):
+        # Windows 只读文件：去掉只读属性后重试一次
+        try:
+            os.chmod(path, 0o700)
+            func(path)
+        except OSError as e:
+            self._fail(path, e)
+
+    def _delete(self, path: str):
+        try:
+            if self._is_link(path):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    os.rmdir(path)  # Windows junction
+            elif os.path.isdir(path):
+                shutil.rmtree(path, onerror=self._onerror)
+            else:
+                try:
+                    os.unlink(path)
+                except PermissionError:
+                    os.chmod(path, 0o600)
+                    os.unlink(path)
+        except OSError as e:
+            self._fail(path, e)
+        with self._lock:
+            self._done += 1
+
+    def run(self) -> bool:
+        t0 = time.perf_counter()
+        units = self._units()
+        total = len(units)
+        ConsolePrinter.print(self.name, f"Deleting {self.label}: {total} entries with {self.workers} workers")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="delete") as pool:
+            futures = [pool.submit(self._delete, u) for u in units]
+            last = time.perf_counter()
+            for _f in futures:
+                _f.result()
+                if time.perf_counter() - last >= self.interval:
+                    last = time.perf_counter()
+                    pct = self._done * 100 // max(total, 1)
+                    ConsolePrinter.print(self.name, f"Deleting {self.label}: {self._done}/{total} ({pct}%)")
+        # 展开过的空目录与根目录本身
+        for cur, _dirs, _files in os.walk(self.root, topdown=False):
+            try:
+                os.rmdir(cur)
+            except OSError as e:
+                self._fail(cur, e)
+        elapsed = time.perf_counter() - t0
+        if self.failures:
+            ConsolePrinter.print(
+                self.name, f"Deleted {self.label} in {elapsed:.1f}s with {len(self.failures)} failure(s):"
+            )
+            for path, err in self.failures[:10]:
+                ConsolePrinter.print(self.name, f"  {path}: {err}")
+            if len(self.failures) > 10:
+                ConsolePrinter.print(self.name, f"  ... and {len(self.failures) - 10} more")
+            return False
+        ConsolePrinter.print(self.name, f"Deleted {self.label} in {elapsed:.1f}s")
+        return True
+
+    def start(self, on_done: Callable[[], object] = None) -> threading.Thread:
+        """后台线程中执行 run()；结束后（无论成败）调用 on_done。"""
+
+        def _run():
+            try:
+                self.run()
+            finally:
+                if on_done is not None:
+                    on_done()
+
+        t = threading.Thread(target=_run, name="delete-tree", daemon=True)
+        t.start()
+        return t
+
+
+class ToolchainLocator:
+    """
+    工具链自动发现（redis-server / node+npm），替代每台新机器上的文件夹对话框：
+    1) 探测 PATH、常见安装目录与版本管理器目录（nvm-windows / fnm / volta / scoop / conda envs）；
+       只列 Windows 布局——调用方要求的 node.exe / redis-server.exe 等只会出现在这些位置
+    2) 候选目录需包含全部 required_files；按 `--version` 解析出的版本从高到低排序
+    3) 结果连同搜索根目录的 mtime 记入 LaunchManifest，目录未变化时下次直接复用
+    4) TOOLCHAIN_DISCOVERY=0 关闭，直接走对话框
+    """
+
+    name = "Toolchain"
+    _VERSION_RE = re.compile(r"(\d+)\.(\d+)\.(\d+)")
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.getenv("TOOLCHAIN_DISCOVERY", "1").strip().lower() not in ("0", "false", "no")
+
+    @staticmethod
+    def _env_path(var: str, *parts: str) -> Optional[Path]:
+        base = os.getenv(var)
+        return Path(base, *parts) if base else None
+
+    @staticmethod
+    def _children(root: Optional[Path], *suffix: str) -> list[Path]:
+        if root is None or not root.is_dir():
+            return []
+        try:
+            return [Path(e.path, *suffix) for e in os.scandir(root) if e.is_dir()]
+        except OSError:
+            return []
+
+    @staticmethod
+    def _conda_envs() -> list[Path]:
+        home = Path.home()
+        bases = [ToolchainLocator._env_path("CONDA_PREFIX")]
+        bases += [home / n for n in ("miniconda3", "anaconda3", "miniforge3", "mambaforge")]
+        bases += [ToolchainLocator._env_path("ProgramData", n) for n in ("miniconda3", "anaconda3")]
+        envs = []
+        for b in bases:
+            if b is None:
+                continue
+            envs.append(b)
+            envs += ToolchainLocator._children(b / "envs")
+        return envs
+
+    @staticmethod
+    def search_roots(tool: str) -> tuple[list[Path], list[Path]]:
+        """返回 (候选目录, 需记录 mtime 的父目录)；父目录内新增版本会改变其 mtime，从而使缓存失效。"""
+        home = Path.home()
+        env = ToolchainLocator._env_path
+        children = ToolchainLocator._children
+        dirs = [Path(p) for p in os.getenv("PATH", "").split(os.pathsep) if p]
+        parents: list[Path] = []
+        scoop = env("SCOOP") or home / "scoop"
+        conda = ToolchainLocator._conda_envs()
+        if tool == "redis":
+            dirs += [env("ProgramFiles", "Redis"), Path("C:/Redis"), scoop / "apps" / "redis" / "current"]
+            parents += [scoop / "apps" / "redis"]
+            dirs += children(scoop / "apps" / "redis")
+            dirs += [c / "Library" / "bin" for c in conda]
+        else:
+            nvm_home = env("NVM_HOME") or env("APPDATA", "nvm")
+            fnm = env("FNM_DIR") or env("APPDATA", "fnm")
+            volta = env("VOLTA_HOME") or env("LOCALAPPDATA", "Volta")
+            dirs += [env("ProgramFiles", "nodejs"), env("NVM_SYMLINK")]
+            dirs += children(nvm_home)
+            if fnm is not None:
+                dirs += children(fnm / "node-versions", "installation")
+            if volta is not None:
+                dirs += children(volta / "tools" / "image" / "node")
+            for app in ("nodejs", "nodejs-lts"):
+                dirs += [scoop / "apps" / app / "current"] + children(scoop / "apps" / app)
+                parents.append(scoop / "apps" / app)
+            parents += [nvm_home]
+            parents += [fnm / "node-versions"] if fnm is not None else []
+            parents += [volta / "tools" / "image" / "node"] if volta is not None else []
+            dirs += conda
+        parents += [c / "envs" for c in conda]
+        seen, out = set(), []
+        for d in dirs:
+            if d is None:
+                continue
+            key = os.path.normcase(os.path.realpath(d))
+            if key not in seen:
+                seen.add(key)
+                out.append(d)
+        return out, [p for p in parents if p is not None]
+
+    @staticmethod
+    def _version(exe: Path) -> tuple:
+        try:
+            out = subprocess.run(
+                [str(exe), "--version"], capture_output=True, text=True, timeout=5, check=False
+            ).stdout
+        except Exception:
+            return ()
+        m = ToolchainLocator._VERSION_RE.search(out or "")
+        return tuple(int(x) for x in m.groups()) if m else ()
+
+    @staticmethod
+    def discover(tool: str, env_var: str, required_files: list, manifest: "LaunchManifest" = None) -> list:
+        """返回按版本降序排列的 [目录, 版本] 列表（可能为空）。"""
+        dirs, parents = ToolchainLocator.search_roots(tool)
+        fp = LaunchManifest.fingerprint(*parents, extra=os.getenv("PATH", ""))
+        check = f"discover:{env_var}"
+        if manifest is not None:
+            cached = manifest.lookup(check, fp)
+            if cached:
+                # 缓存命中仍需确认目录内文件还在（仅 stat，不再运行 --version）；全部失效时重新探测
+                alive = [c for c in cached if all((Path(c[0]) / f).exists() for f in required_files)]
+                if alive:
+                    return alive
+
+        hits = [d for d in dirs if all((d / f).exists() for f in required_files)]
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(hits)))) as pool:
+            versions = list(pool.map(lambda d: ToolchainLocator._version(d / required_files[0]), hits))
+        # 稳定排序：版本相同则保留探测顺序（PATH 优先）
+        ranked = sorted(zip(hits, versions), key=lambda x: x[1], reverse=True)
+        result = [[str(d), ".".join(map(str, v)) or "?"] for d, v in ranked]
+        # 空结果不记录：在已有子目录里新装（nvm 新版本目录、scoop current 原地更新）不会改变根目录 mtime，
+        # 记下空结果会让之后每次启动都直接落到文件夹对话框
+        if manifest is not None and result:
+            manifest.record(check, fp, result)
+        return result
+
+
+class PathPicker:
+    name = "PathPicker"
+
+    @staticmethod
+    def _check_path_valid(path: str, required_files: list) -> bool:
+        p = Path(path)
+        if not p.exists():
+            return False
+        return all((p / f).exists() for f in required_files)
+
+    @staticmethod
+    def pick_and_validate(
+        cfg: ConfigManager,
+        env_var: str,
+        title: str,
+        required_files: list,
+        manifest: "LaunchManifest" = None,
+        discover: str = None,
+    ) -> str:
+        current = cfg.get(env_var, "")
+        if current and manifest is not None:
+            fp = LaunchManifest.fingerprint(*(Path(current) / f for f in required_files))
+            if manifest.lookup(f"path:{env_var}", fp) == current:
+                ConsolePrinter.print(PathPicker.name, f"{env_var} already set: {current} (cached)")
+                return current
+        if current and PathPicker._check_path_valid(current, required_files):
+            ConsolePrinter.print(PathPicker.name, f"{env_var} already set: {current}")
+            if manifest is not None:
+                manifest.record(f"path:{env_var}", fp, current)
+            return current
+
+        # 自动发现；找不到时才弹出对话框
+        if discover and ToolchainLocator.enabled():
+            with PROFILER.span(f"discover:{discover}"):
+                found = ToolchainLocator.discover(discover, env_var, required_files, manifest=manifest)
+            if found:
+                chosen, version = found[0]
+                cfg.set(env_var, chosen)
+                if manifest is not None:
+                    fp = LaunchManifest.fingerprint(*(Path(chosen) / f for f in required_files))
+                    manifest.record(f"path:{env_var}", fp, chosen)
+                others = f" ({len(found) - 1} other candidate(s))" if len(found) > 1 else ""
+                ConsolePrinter.print(PathPicker.name, f"Discovered {env_var}: {chosen} (v{version}){others}")
+                return chosen
+            ConsolePrinter.print(PathPicker.name, f"No {discover} installation found, asking for {env_var}")
+
+        while True:
+            chosen = Dialogs.ask_directory(title)
+            if not chosen:
+                ans = Dialogs.yes_no_cancel(
+                    "未选择目录", f"没有选择任何目录。\n是否重试选择 {env_var} ？", timeout_sec=0
+                )
+                if ans == "yes":
+                    continue
+                sys.exit(1)
+
+            if PathPicker._check_path_valid(chosen, required_files):
+                cfg.set(env_var, chosen)
+                if manifest is not None:
+                    fp = LaunchManifest.fingerprint(*(Path(chosen) / f for f in required_files))
+                    manifest.record(f"path:{env_var}", fp, chosen)
+                ConsolePrinter.print(PathPicker.name, f"Set {env_var} to {chosen}")
+                return chosen
+            else:
+                ans = Dialogs.yes_no_cancel(
+                    "目录无效", f"目录缺少：{', '.join(required_files)}\n是否重新选择？", timeout_sec=0
+                )
+                if ans != "yes":
+                    sys.exit(1)
+
+
+class EnvFileManager:
+    name = "EnvFileManager"
+
+    @staticmethod
+    def copy_envs(project_root: Path):
+        backend_env = project_root / "backend" / ".env.dev"
+        frontend_env = project_root / "frontend" / ".env.development"
+        backend_env_example = project_root / "backend" / ".env.dev.example"
+        frontend_env_example = project_root / "frontend" / ".env.example"
+
+        if not backend_env.exists():
+            if backend_env_example.exists():
+                shutil.copy(backend_env_example, backend_env)
+                ConsolePrinter.print(EnvFileManager.name, f"Created {backend_env} from {backend_env_example}")
+            else:
+                ConsolePrinter.print(
+                    EnvFileManager.name, f"Backend .env.dev.example not found at {backend_env_example}"
+                )
+                sys.exit(1)
+        else:
+            ConsolePrinter.print(EnvFileManager.name, f"Backend .env already exists at {backend_env}")
+
+        if not frontend_env.exists():
+            if frontend_env_example.exists():
+                shutil.copy(frontend_env_example, frontend_env)
+                ConsolePrinter.print(EnvFileManager.name, f"Created {frontend_env} from {frontend_env_example}")
+            else:
                 ConsolePrinter.print(EnvFileManager.name, f"Frontend .env.example not found at {frontend_env_example}")
                 sys.exit(1)
         else:
             ConsolePrinter.print(EnvFileManager.name, f"Frontend .env.development already exists at {frontend_env}")
 
 
+class StorePlacement:
+    """
+    uv 缓存 / pnpm store 与项目放在同一卷上，安装时才能用硬链接或 reflink 代替逐文件复制：
+    1) 已显式设置 UV_CACHE_DIR / PNPM_STORE_DIR：只校验是否同卷，不同卷时提示并改用 copy
+    2) 工具默认位置与项目同卷：沿用默认位置（本机所有检出共享）
+    3) 否则放到项目所在卷根目录的 .mma-cache/（同卷所有检出共享）；无写权限时依次退到项目上级目录、项目根目录
+    4) 按文件系统选择链接方式：ReFS / btrfs / xfs / apfs -> reflink，能建硬链接 -> hardlink，否则 copy
+    STORE_PLACEMENT=0 关闭，恢复旧行为（UV_LINK_MODE=copy，pnpm 默认 store）
+    """
+
+    name = "Stores"
+    DIR_NAME = ".mma-cache"
+    REFLINK_FS = {"refs", "btrfs", "xfs", "apfs"}
+    # 链接方式 -> 各工具的配置值
+    UV_MODES = {"reflink": "clone", "hardlink": "hardlink", "copy": "copy"}
+    PNPM_MODES = {"reflink": "clone-or-copy", "hardlink": "hardlink", "copy": "copy"}
+    _resolved: dict = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.getenv("STORE_PLACEMENT", "1").strip().lower() not in ("0", "false", "no")
+
+    @staticmethod
+    def _dev(path: Path) -> Optional[int]:
+        """路径所在设备号；路径尚不存在时取最近的已存在祖先目录。"""
+        for p in (path, *path.parents):
+            try:
+                return os.stat(p).st_dev
+            except OSError:
+                continue
+        return None
+
+    @staticmethod
+    def volume_root(path: Path) -> Path:
+        path = path.resolve()
+        if os.name == "nt":
+            return Path(path.anchor)
+        dev = StorePlacement._dev(path)
+        while path.parent != path and StorePlacement._dev(path.parent) == dev:
+            path = path.parent
+        return path
+
+    @staticmethod
+    def fs_type(path: Path) -> str:
+        if os.name == "nt":
+            try:
+                import ctypes
+
+                buf = ctypes.create_unicode_buffer(64)
+                ok = ctypes.windll.kernel32.GetVolumeInformationW(
+                    ctypes.c_wchar_p(str(StorePlacement.volume_root(path))), None, 0, None, None, None, buf, len(buf)
+                )
+                return buf.value.lower() if ok else ""
+            except Exception:
+                return ""
+        if sys.platform == "darwin":
+            return "apfs"
+        best, fs = "", ""
+        real = os.path.realpath(path)
+        try:
+            with open("/proc/mounts", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 3:
+                        continue
+                    mnt = parts[1].replace("\\040", " ")
+                    if (real == mnt or real.startswith(mnt.rstrip("/") + "/")) and len(mnt) > len(best):
+                        best, fs = mnt, parts[2].lower()
+        except OSError:
+            pass
+        return fs
+
+    @staticmethod
+    def _can_hardlink(src_dir: Path, dst_dir: Path) -> bool:
+        probe = src_dir / f".mma-linkprobe-{os.getpid()}"
+        target = dst_dir / probe.name
+        try:
+            probe.write_bytes(b"")
+            os.link(probe, target)
+            return True
+        except OSError:
+            return False
+        finally:
+            for p in (target, probe):
+                with contextlib.suppress(OSError):
+                    p.unlink()
+
+    @staticmethod
+    def _defaults() -> dict:
+        home = Path.home()
+        if os.name == "nt":
+            local = Path(os.getenv("LOCALAPPDATA") or home / "AppData" / "Local")
+            return {"uv": local / "uv" / "cache", "pnpm": local / "pnpm" / "store"}
+        cache = Path(os.getenv("XDG_CACHE_HOME") or home / ".cache")
+        data = Path(os.getenv("XDG_DATA_HOME") or home / ".local" / "share")
+        pnpm = home / "Library" / "pnpm" / "store" if sys.platform == "darwin" else data / "pnpm" / "store"
+        return {"uv": cache / "uv", "pnpm": pnpm}
+
+    @staticmethod
+    def _place(project_root: Path, tool: str, env_var: str, default: Path, local_name: str) -> dict:
+        dev = StorePlacement._dev(project_root)
+        explicit = os.getenv(env_var, "").strip()
+        if explicit:
+            candidates, source = [Path(explicit).expanduser()], "explicit"
+        elif StorePlacement._dev(default) == dev:
+            candidates, source = [default], "default"
+        else:
+            vol = StorePlacement.volume_root(project_root)
+            candidates = [
+                vol / StorePlacement.DIR_NAME / tool,
+                project_root.parent / StorePlacement.DIR_NAME / tool,
+                project_root / local_name,
+            ]
+            source = "same-volume"
+        for d in candidates:
+            try:
+                d.mkdir(parents=True, exist_ok=True)
+            except OSError:
+                continue
+            if StorePlacement._dev(d) != dev:
+                mode = "copy"
+            elif StorePlacement.fs_type(project_root) in StorePlacement.REFLINK_FS:
+                mode = "reflink"
+            else:
+                mode = "hardlink" if StorePlacement._can_hardlink(d, project_root) else "copy"
+            return {"dir": str(d), "mode": mode, "source": source}
+        return {"dir": "", "mode": "copy", "source": "unavailable"}
+
+    @staticmethod
+    def resolve(project_root: Path) -> dict:
+        """每个项目只探测一次（后端 / 前端安装线程共用结果）。"""
+        key = str(project_root)
+        with StorePlacement._lock:
+            if key in StorePlacement._resolved:
+                return StorePlacement._resolved[key]
+            defaults = StorePlacement._defaults()
+            placed = {
+                "uv": StorePlacement._place(project_root, "uv", "UV_CACHE_DIR", defaults["uv"], ".uv-cache"),
+                "pnpm": StorePlacement._place(
+                    project_root, "pnpm", "PNPM_STORE_DIR", defaults["pnpm"], ".pnpm-store"
+                ),
+            }
+            fs = StorePlacement.fs_type(project_root) or "unknown"
+            try:
+                free = CacheCleaner._fmt_bytes(shutil.disk_usage(project_root).free)
+            except OSError:
+                free = "?"
+            for tool, p in placed.items():
+                note = "" if p["mode"] != "copy" or p["source"] != "explicit" else " (different volume, copying)"
+                ConsolePrinter.print(
+                    StorePlacement.name,
+                    f"{tool} store {p['dir'] or '-'} [{p['source']}, {p['mode']}{note}] on {fs}, {free} free",
+                )
+            StorePlacement._resolved[key] = placed
+            return placed
+
+    @staticmethod
+    def apply_uv(env: dict, project_root: Path):
+        if not StorePlacement.enabled():
+            env.setdefault("UV_LINK_MODE", "copy")
+            return
+        p = StorePlacement.resolve(project_root)["uv"]
+        if p["dir"]:
+            env["UV_CACHE_DIR"] = p["dir"]
+        env.setdefault("UV_LINK_MODE", StorePlacement.UV_MODES[p["mode"]])
+
+    @staticmethod
+    def pnpm_args(project_root: Path) -> list[str]:
+        if not StorePlacement.enabled():
+            return []
+        p = StorePlacement.resolve(project_root)["pnpm"]
+        if not p["dir"]:
+            return []
+        return ["--store-dir", p["dir"], "--package-import-method", StorePlacement.PNPM_MODES[p["mode"]]]
+
+    @staticmethod
+    def report(project_root: Path):
+        """打印各 store 的实际占用（完整遍历，较慢，仅供 --store-report 使用）。"""
+        for tool, p in StorePlacement.resolve(project_root).items():
+            if p["dir"]:
+                size = CacheCleaner._dir_size(p["dir"])
+                ConsolePrinter.print(StorePlacement.name, f"{tool} store {p['dir']}: {CacheCleaner._fmt_bytes(size)}")
+        try:
+            usage = shutil.disk_usage(project_root)
+            ConsolePrinter.print(
+                StorePlacement.name,
+                f"volume {StorePlacement.volume_root(project_root)}: {CacheCleaner._fmt_bytes(usage.used)} used, "
+                f"{CacheCleaner._fmt_bytes(usage.free)} free of {CacheCleaner._fmt_bytes(usage.total)}",
+            )
+        except OSError:
+            pass
+
+
+class VenvFingerprint:
+    """
+    后端 venv 指纹记录（.venv/.mma_fingerprint.json），替代整份拷贝 uv.lock 的 .venv.stamp：
+    1) uv.lock / pyproject.toml 的 sha256；mtime/size 未变时沿用记录值，不重新哈希
+    2) venv 解释器版本 / ABI / 平台（读取 pyvenv.cfg，不启动子进程）
+    3) site-packages 抽样：若干 dist-info 的 RECORD 中列出的文件需仍存在且大小一致
+    check() 返回 None 表示可跳过同步，否则返回需要重新同步的具体原因
+    """
+
+    name = "VenvFingerprint"
+    FILE_NAME = ".mma_fingerprint.json"
+    VERSION = 1
+    INPUTS = ("uv.lock", "pyproject.toml")
+    SAMPLE_SIZE = 24
+
+    @staticmethod
+    def _stat(path: Path) -> Optional[list]:
+        try:
+            st = os.stat(path)
+            return [st.st_mtime_ns, st.st_size]
+        except OSError:
+            return None
+
+    @staticmethod
+    def _sha256(path: Path) -> Optional[str]:
+        h = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        except OSError:
+            return None
+        return h.hexdigest()
+
+    @staticmethod
+    def _pyvenv_cfg(venv_dir: Path) -> dict:
+        cfg = {}
+        try:
+            for line in (venv_dir / "pyvenv.cfg").read_text(encoding="utf-8", errors="ignore").splitlines():
+                if "=" in line:
+                    k, v = line.split("=", 1)
+                    cfg[k.strip().lower()] = v.strip()
+        except OSError:
+            pass
+        return cfg
+
+    @staticmethod
+    def site_packages(venv_dir: Path) -> Optional[Path]:
+        if os.name == "nt":
+            sp = venv_dir / "Lib" / "site-packages"
+            return sp if sp.is_dir() else None
+        for sp in sorted(venv_dir.glob("lib/python*/site-packages")):
+            return sp
+        return None
+
+    @staticmethod
+    def interpreter(venv_dir: Path) -> dict:
+        cfg = VenvFingerprint._pyvenv_cfg(venv_dir)
+        version = cfg.get("version_info") or cfg.get("version") or ""
+        impl = cfg.get("implementation", "CPython")
+        parts = version.split(".")
+        abi = ""
+        if len(parts) >= 2:
+            abi = ("cp" if impl.lower() == "cpython" else impl.lower()[:2]) + parts[0] + parts[1]
+            sp = VenvFingerprint.site_packages(venv_dir)
+            if sp is not None and sp.parent.name.endswith("t"):
+                abi += "t"  # free-threaded 构建
+        return {
+            "version": version,
+            "abi": abi,
+            "platform": f"{sys.platform}-{platform.machine().lower()}",
+            "home": cfg.get("home", ""),
+        }
+
+    @staticmethod
+    def _sample(venv_dir: Path) -> list:
+        """均匀抽取若干已安装包，每个记录 RECORD 中前两个包内文件的相对路径与大小。"""
+        sp = VenvFingerprint.site_packages(venv_dir)
+        if sp is None:
+            return []
+        try:
+            dists = sorted(e.name for e in os.scandir(sp) if e.name.endswith(".dist-info"))
+        except OSError:
+            return []
+        step = max(1, len(dists) // VenvFingerprint.SAMPLE_SIZE)
+        sample = []
+        for dist in dists[::step][: VenvFingerprint.SAMPLE_SIZE]:
+            try:
+                lines = (sp / dist / "RECORD").read_text(encoding="utf-8", errors="ignore").splitlines()
+            except OSError:
+                continue
+            picked = 0
+            for line in lines:
+                rel, _, rest = line.partition(",")
+                size = rest.rpartition(",")[2]
+                if not size.isdigit() or rel.startswith("..") or ".dist-info/" in rel:
+                    continue
+                sample.append([rel, int(size)])
+                picked += 1
+                if picked == 2:
+                    break
+        return sample
+
+    @staticmethod
+    def inputs(backend_dir: Path, previous: dict = None) -> dict:
+        out = {}
+        for name in VenvFingerprint.INPUTS:
+            st = VenvFingerprint._stat(backend_dir / name)
+            prev = (previous or {}).get(name)
+            if prev and st is not None and prev.get("stat") == st:
+                out[name] = prev  # stat 快速预检：未变化则不重新哈希
+            else:
+                out[name] = {"stat": st, "sha256": VenvFingerprint._sha256(backend_dir / name) if st else None}
+        return out
+
+    @staticmethod
+    def load(venv_dir: Path) -> Optional[dict]:
+        try:
+            rec = json.loads((venv_dir / VenvFingerprint.FILE_NAME).read_text(encoding="utf-8"))
+        except Exception:
+            return None
+        return rec if rec.get("version") == VenvFingerprint.VERSION else None
+
+    @staticmethod
+    def _save(venv_dir: Path, rec: dict):
+        path = venv_dir / VenvFingerprint.FILE_NAME
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps(rec, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            ConsolePrinter.print(VenvFingerprint.name, f"Failed to write {path}: {e}")
+
+    @staticmethod
+    def write(backend_dir: Path, venv_dir: Path, previous: dict = None):
+        VenvFingerprint._save(
+            venv_dir,
+            {
+                "version": VenvFingerprint.VERSION,
+                "inputs": VenvFingerprint.inputs(backend_dir, (previous or {}).get("inputs")),
+                "interpreter": VenvFingerprint.interpreter(venv_dir),
+                "sample": VenvFingerprint._sample(venv_dir),
+            },
+        )
+        # 旧版哨兵已不再使用
+        with contextlib.suppress(OSError):
+            (venv_dir / ".venv.stamp").unlink()
+
+    @staticmethod
+    def annotate(venv_dir: Path, key: str, value):
+        """在现有记录上附加信息（如预编译结果）；重新 write() 时会被清除。"""
+        rec = VenvFingerprint.load(venv_dir)
+        if rec is not None:
+            rec[key] = value
+            VenvFingerprint._save(venv_dir, rec)
+
+    @staticmethod
+    def check(backend_dir: Path, venv_dir: Path) -> Optional[str]:
+        rec = VenvFingerprint.load(venv_dir)
+        if rec is None:
+            if (venv_dir / ".venv.stamp").exists():
+                return "legacy .venv.stamp found, no fingerprint record yet"
+            return "no fingerprint record (first sync)"
+
+        old_interp, new_interp = rec.get("interpreter", {}), VenvFingerprint.interpreter(venv_dir)
+        for key in ("version", "abi", "platform", "home"):
+            if old_interp.get(key) != new_interp.get(key):
+                return f"interpreter {key} changed: {old_interp.get(key) or '-'} -> {new_interp.get(key) or '-'}"
+        if new_interp["home"] and not Path(new_interp["home"]).exists():
+            return f"base interpreter missing: {new_interp['home']}"
+
+        old_inputs = rec.get("inputs", {})
+        new_inputs = VenvFingerprint.inputs(backend_dir, old_inputs)
+        for name in VenvFingerprint.INPUTS:
+            old_sha = (old_inputs.get(name) or {}).get("sha256")
+            new_sha = new_inputs[name]["sha256"]
+            if old_sha != new_sha:
+                return f"{name} changed (sha256 {(old_sha or 'missing')[:12]} -> {(new_sha or 'missing')[:12]})"
+
+        sp = VenvFingerprint.site_packages(venv_dir)
+        for rel, size in rec.get("sample", []):
+            st = VenvFingerprint._stat(sp / rel) if sp is not None else None
+            if st is None:
+                return f"site-packages incomplete: {rel} missing"
+            if st[1] != size:
+                return f"site-packages modified: {rel} size {st[1]} != {size}"
+
+        # 内容一致但 mtime 变了（如切换分支后又切回）：刷新 stat，下次仍走快速路径
+        if new_inputs != old_inputs:
+            rec["inputs"] = new_inputs
+            VenvFingerprint._save(venv_dir, rec)
+        return None
+
+
+class VenvSnapshotStore:
+    """
+    按锁文件指纹保存 .venv 快照（项目根 .mma_venv_store/<key>/），切换分支/检出时秒级恢复：
+    1) uv sync 成功后把 .venv 硬链接克隆进快照库（跨盘或不支持硬链接时退化为复制）
+    2) 再次遇到相同 uv.lock + pyproject.toml + 平台时，旧 .venv 移入回收站，从快照克隆回来后重新校验指纹
+    3) 按最近使用时间 LRU 淘汰，总大小上限 VENV_SNAPSHOT_MAX_MB（默认 4096）；VENV_SNAPSHOTS=0 关闭
+    快照内含绝对路径（脚本 shebang、pyvenv.cfg 等），因此只在同一项目内原位置恢复。
+    """
+
+    name = "VenvSnapshot"
+    DIR_NAME = ".mma_venv_store"
+    META = "snapshot.json"
+
+    def __init__(self, project_root: Path):
+        self.project_root = project_root
+        self.root = project_root / self.DIR_NAME
+        self.max_bytes = int(float(os.getenv("VENV_SNAPSHOT_MAX_MB", "4096")) * 1024 * 1024)
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.getenv("VENV_SNAPSHOTS", "1").strip().lower() not in ("0", "false", "no")
+
+    @staticmethod
+    def key(backend_dir: Path, previous: dict = None) -> str:
+        inputs = VenvFingerprint.inputs(backend_dir, previous)
+        payload = [inputs[n]["sha256"] for n in VenvFingerprint.INPUTS]
+        payload.append(f"{sys.platform}-{platform.machine().lower()}")
+        return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _clone(src: Path, dst: Path) -> str:
+        """硬链接克隆目录树；任一文件无法硬链接时该文件改为复制。返回 hardlink / copy / mixed。"""
+        used = set()
+
+        def _link_or_copy(s, d):
+            try:
+                os.link(s, d)
+                used.add("hardlink")
+                return d
+            except OSError:
+                used.add("copy")
+                return shutil.copy2(s, d)
+
+        shutil.copytree(src, dst, symlinks=True, copy_function=_link_or_copy)
+        return used.pop() if len(used) == 1 else ("mixed" if used else "copy")
+
+    def _meta(self, snap: Path) -> dict:
+        try:
+            return json.loads((snap / self.META).read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+
+    def _write_meta(self, snap: Path, meta: dict):
+        with contextlib.suppress(OSError):
+            (snap / self.META).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def restore(self, key: str, venv_dir: Path) -> bool:
+        snap = self.root / key
+        if not (snap / "venv").is_dir():
+            return False
+        t0 = time.perf_counter()
+        trash = TrashBin(self.project_root)
+        if venv_dir.exists() and not trash.move(venv_dir):
+            shutil.rmtree(venv_dir, ignore_errors=True)
+        if venv_dir.exists():
+            ConsolePrinter.print(self.name, f"Cannot replace {venv_dir}, skip snapshot restore")
+            return False
+        try:
+            mode = self._clone(snap / "venv", venv_dir)
+        except (OSError, shutil.Error) as e:
+            ConsolePrinter.print(self.name, f"Restore snapshot {key} failed: {e}")
+            shutil.rmtree(venv_dir, ignore_errors=True)
+            return False
+        if trash.used:
+            TrashBin.spawn_worker(self.project_root, "trash")
+        meta = self._meta(snap)
+        meta["last_used"] = time.time()
+        self._write_meta(snap, meta)
+        ConsolePrinter.print(
+            self.name, f"Restored .venv from snapshot {key} ({mode}, {time.perf_counter() - t0:.1f}s)"
+        )
+        return True
+
+    def save(self, key: str, venv_dir: Path):
+        snap = self.root / key
+        if (snap / "venv").is_dir():
+            meta = self._meta(snap)
+            meta["last_used"] = time.time()
+            self._write_meta(snap, meta)
+            return
+        t0 = time.perf_counter()
+        tmp = self.root / f"{key}.tmp-{os.getpid()}"
+        try:
+            shutil.rmtree(tmp, ignore_errors=True)
+            tmp.mkdir(parents=True)
+            mode = self._clone(venv_dir, tmp / "venv")
+            size = CacheCleaner._dir_size(str(tmp / "venv"))
+            now = time.time()
+            self._write_meta(tmp, {"key": key, "created": now, "last_used": now, "size": size, "mode": mode})
+            os.rename(tmp, snap)
+        except (OSError, shutil.Error) as e:
+            ConsolePrinter.print(self.name, f"Save snapshot {key} failed: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        ConsolePrinter.print(
+            self.name,
+            f"Saved .venv snapshot {key} ({mode}, {CacheCleaner._fmt_bytes(size)}, {time.perf_counter() - t0:.1f}s)",
+        )
+        self.evict(keep=key)
+
+    def evict(self, keep: str = None):
+        """按 last_used 从旧到新淘汰，直到总大小不超过上限（keep 指定的快照不淘汰）。"""
+        try:
+            snaps = [Path(e.path) for e in os.scandir(self.root) if e.is_dir() and ".tmp-" not in e.name]
+        except OSError:
+            return
+        metas = [(s, self._meta(s)) for s in snaps]
+        total = sum(m.get("size", 0) for _s, m in metas)
+        for snap, meta in sorted(metas, key=lambda x: x[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if snap.name == keep:
+                continue
+            shutil.rmtree(snap, ignore_errors=True)
+            total -= meta.get("size", 0)
+            freed = CacheCleaner._fmt_bytes(meta.get("size", 0))
+            ConsolePrinter.print(self.name, f"Evicted snapshot {snap.name} ({freed})")
+
+
+class Wheelhouse:
+    """
+    后端离线安装用的 wheel 目录（与 Bootstrapper 共用：BOOTSTRAP_WHEEL_DIR，默认脚本同级 wheelhouse/）：
+    1) build()：在联网机器上把 backend/uv.lock 导出为 requirements.txt，按目标 Python 下载全部 wheel，
+       外加 uv 与启动器自身依赖（python-dotenv、psutil），并写入 manifest.json
+    2) OFFLINE_INSTALL=1 时后端改为 `uv pip sync --offline --no-index --find-links <目录>`；
+       安装前先 verify()：锁文件 / 平台不符或缺少 wheel 时立即列出并退出，而不是卡在网络超时上
+    """
+
+    name = "Wheelhouse"
+    MANIFEST = "manifest.json"
+    REQUIREMENTS = "requirements.txt"
+    VERSION = 1
+    EXTRA = ("uv", "python-dotenv", "psutil")
+
+    @staticmethod
+    def offline() -> bool:
+        return os.getenv("OFFLINE_INSTALL", "").strip().lower() in ("1", "true", "yes")
+
+    @staticmethod
+    def _norm(name: str) -> str:
+        return re.sub(r"[-_.]+", "_", name).lower()
+
+    @staticmethod
+    def _platform() -> str:
+        return f"{sys.platform}-{platform.machine().lower()}"
+
+    @staticmethod
+    def _wheels(d: Path) -> set:
+        out = set()
+        for f in d.glob("*.whl"):
+            parts = f.name.split("-")
+            if len(parts) >= 5:
+                out.add((Wheelhouse._norm(parts[0]), parts[1].lower()))
+        return out
+
+    @staticmethod
+    def _pinned(req_file: Path) -> set:
+        out = set()
+        try:
+            lines = req_file.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return out
+        for line in lines:
+            spec = line.split(";", 1)[0].split("#", 1)[0].strip().rstrip("\\").strip()
+            if "==" in spec and not spec.startswith("-"):
+                name, _, version = spec.partition("==")
+                out.add((Wheelhouse._norm(name.split("[", 1)[0].strip()), version.strip().lower()))
+        return out
+
+    @staticmethod
+    def _python_version(backend_dir: Path) -> str:
+        try:
+            pinned = (backend_dir / ".python-version").read_text(encoding="utf-8").split()
+            if pinned:
+                return pinned[0]
+        except OSError:
+            pass
+        return f"{sys.version_info.major}.{sys.version_info.minor}"
+
+    @staticmethod
+    def load_manifest(d: Path) -> Optional[dict]:
+        try:
+            data = json.loads((d / Wheelhouse.MANIFEST).read_text(encoding="utf-8"))
+        except Exception:
+            return None
+        return data if data.get("version") == Wheelhouse.VERSION else None
+
+    @staticmethod
+    def build(project_root: Path) -> bool:
+        backend_dir = project_root / "backend"
+        d = Bootstrapper.wheel_path()
+        req = d / Wheelhouse.REQUIREMENTS
+        if not (backend_dir / "uv.lock").exists():
+            ConsolePrinter.print(Wheelhouse.name, f"uv.lock not found in {backend_dir}")
+            return False
+        uv_cmd = BackendInstaller._resolve_uv_cmd()
+        if uv_cmd is None:
+            subprocess.run([sys.executable, "-m", "pip", "install", "uv"], check=False)
+            uv_cmd = BackendInstaller._resolve_uv_cmd()
+        if uv_cmd is None:
+            ConsolePrinter.print(Wheelhouse.name, "Failed to locate 'uv'")
+            return False
+        d.mkdir(parents=True, exist_ok=True)
+        pyver = Wheelhouse._python_version(backend_dir)
+        ConsolePrinter.print(Wheelhouse.name, f"Building wheelhouse in {d} (python {pyver}, {Wheelhouse._platform()})")
+
+        export = ["export", "--frozen", "--no-hashes", "--no-emit-project", "--format", "requirements-txt"]
+        if SubprocessStreamer.run(uv_cmd + export + ["-o", str(req)], prefix="uv", cwd=backend_dir) != 0:
+            ConsolePrinter.print(Wheelhouse.name, "uv export failed")
+            return False
+        download = [sys.executable, "-m", "pip", "download", "--only-binary=:all:", "-d", str(d)]
+        # 后端依赖按 venv 的 Python 版本下载；uv 与启动器依赖装在运行启动器的 Python 上
+        if SubprocessStreamer.run(download + ["--python-version", pyver, "-r", str(req)], prefix="pip") != 0:
+            ConsolePrinter.print(Wheelhouse.name, "pip download failed (a dependency may have no wheel)")
+            return False
+        if SubprocessStreamer.run(download + list(Wheelhouse.EXTRA), prefix="pip") != 0:
+            ConsolePrinter.print(Wheelhouse.name, f"pip download of {', '.join(Wheelhouse.EXTRA)} failed")
+            return False
+
+        pinned, have = Wheelhouse._pinned(req), Wheelhouse._wheels(d)
+        manifest = {
+            "version": Wheelhouse.VERSION,
+            "built": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "platform": Wheelhouse._platform(),
+            "python": pyver,
+            "lock_sha256": VenvFingerprint._sha256(backend_dir / "uv.lock"),
+            "requirements": sorted(pinned & have),
+            # 因环境标记（如 sys_platform）被 pip 跳过的依赖，不要求离线机器提供
+            "skipped": sorted(pinned - have),
+        }
+        (d / Wheelhouse.MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        size = sum(f.stat().st_size for f in d.glob("*.whl"))
+        ConsolePrinter.print(
+            Wheelhouse.name,
+            f"Wheelhouse ready: {len(manifest['requirements'])} backend wheels + {', '.join(Wheelhouse.EXTRA)} "
+            f"({CacheCleaner._fmt_bytes(size)}); copy {d} to offline machines and set OFFLINE_INSTALL=1",
+        )
+        return True
+
+    @staticmethod
+    def verify(backend_dir: Path, need_uv: bool = False) -> list[str]:
+        """返回离线安装的阻塞问题列表（空列表表示可以安装）。"""
+        d = Bootstrapper.wheel_path()
+        manifest = Wheelhouse.load_manifest(d)
+        if manifest is None:
+            return [f"no wheelhouse manifest in {d}; run `--wheelhouse-build` on a connected machine"]
+        problems = []
+        if manifest["platform"] != Wheelhouse._platform():
+            problems.append(f"wheelhouse built for {manifest['platform']}, this machine is {Wheelhouse._platform()}")
+        if manifest["lock_sha256"] != VenvFingerprint._sha256(backend_dir / "uv.lock"):
+            problems.append("wheelhouse was built from a different backend/uv.lock; rebuild it")
+        have = Wheelhouse._wheels(d)
+        missing = [f"{n}=={v}" for n, v in manifest["requirements"] if (n, v) not in have]
+        if need_uv and not any(n == "uv" for n, _v in have):
+            missing.append("uv (any version)")
+        if missing:
+            problems.append(f"missing {len(missing)} wheel(s): {', '.join(missing)}")
+        return problems
+
+
+class BytecodePrecompiler:
+    """
+    后端依赖同步后的并行字节码预编译：
+    1) 用 venv 自己的 Python 运行 `compileall -j 0`（每核一个进程），覆盖 site-packages 与 backend/app
+    2) 以 VenvFingerprint 记录中的 precompile 字段为门槛：每个依赖集合只编译一次，重新同步后自动失效
+    3) 编译前后各计时一次 `import app.main`，报告首次启动节省的时间；计时使用与 BackendService 相同的环境，
+       编译前的一次把 PYTHONPYCACHEPREFIX 指向空临时目录（已有的 __pycache__ 不会被读取，也不写入新 .pyc）
+    PRECOMPILE=0 关闭；PRECOMPILE_MEASURE=0 只编译不计时
+    """
+
+    name = "Precompile"
+
+    @staticmethod
+    def _flag(var: str) -> bool:
+        return os.getenv(var, "1").strip().lower() not in ("0", "false", "no")
+
+    @staticmethod
+    def _time_import(python: Path, backend_dir: Path, env: dict, cold: bool) -> Optional[float]:
+        env = dict(env)
+        with contextlib.ExitStack() as stack:
+            if cold:
+                env["PYTHONPYCACHEPREFIX"] = stack.enter_context(tempfile.TemporaryDirectory(prefix="mma-pyc-"))
+                env["PYTHONDONTWRITEBYTECODE"] = "1"
+            t0 = time.perf_counter()
+            try:
+                rc = subprocess.run(
+                    [str(python), "-c", "import app.main"],
+                    cwd=str(backend_dir),
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=180,
+                ).returncode
+            except (OSError, subprocess.TimeoutExpired):
+                return None
+            return time.perf_counter() - t0 if rc == 0 else None
+
+    @staticmethod
+    def run(backend_dir: Path, venv_dir: Path, env: dict):
+        """env：后端服务的运行环境（LayeredConfig.service_env("backend", ...)），用于 import 计时。"""
+        if not BytecodePrecompiler._flag("PRECOMPILE"):
+            return
+        rec = VenvFingerprint.load(venv_dir)
+        if rec is None or rec.get("precompile"):
+            return
+        python = BackendInstaller._venv_python(venv_dir)
+        targets = [str(p) for p in (VenvFingerprint.site_packages(venv_dir), backend_dir / "app") if p and p.is_dir()]
+        if not targets:
+            return
+        measure = BytecodePrecompiler._flag("PRECOMPILE_MEASURE")
+        with PROFILER.span("precompile"):
+            cold = BytecodePrecompiler._time_import(python, backend_dir, env, cold=True) if measure else None
+            t0 = time.perf_counter()
+            proc = subprocess.run(
+                [str(python), "-m", "compileall", "-q", "-j", "0", *targets],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+            )
+            elapsed = time.perf_counter() - t0
+            warm = BytecodePrecompiler._time_import(python, backend_dir, env, cold=False) if measure else None
+
+        # 个别包自带的测试/模板文件语法不兼容属正常现象，只计数不视为失败
+        failed = sum(1 for line in (proc.stdout or "").splitlines() if line.startswith("***"))
+        result = {"seconds": round(elapsed, 2), "workers": os.cpu_count(), "failed_files": failed}
+        msg = f"Compiled venv + backend/app in {elapsed:.1f}s ({os.cpu_count()} workers"
+        msg += f", {failed} file(s) skipped)" if failed else ")"
+        if cold is not None and warm is not None:
+            result.update(import_cold=round(cold, 2), import_warm=round(warm, 2))
+            drop = (cold - warm) / cold * 100 if cold > 0 else 0.0
+            msg += f"; backend first-start import {cold:.2f}s -> {warm:.2f}s (-{drop:.0f}%)"
+        elif measure:
+            msg += "; import app.main failed, first-start timing not measured"
+        VenvFingerprint.annotate(venv_dir, "precompile", result)
+        ConsolePrinter.print(BytecodePrecompiler.name, msg)
+
+
+class UvSyncReport:
+    """
+    解析 uv sync / uv pip sync 的输出，生成结构化安装报告：
+    1) 阶段耗时：Resolved / Prepared / Uninstalled / Installed / Audited 汇总行中 uv 自报的耗时
+    2) 包来源：Prepared = 需要下载或构建的包；Installed - Prepared = 直接由本地缓存提供
+    3) 字节数：同步前后 uv 缓存 archive 目录新增条目的大小（解压后大小）
+    每次同步追加一行到 .mma_profile/install-history.jsonl，便于跨机器追踪安装回退
+    """
+
+    name = "InstallReport"
+    FILE_NAME = "install-history.jsonl"
+    _SUMMARY_RE = re.compile(
+        r"^(Resolved|Prepared|Uninstalled|Installed|Audited)\s+(\d+)\s+packages?\s+in\s+(.+?)\s*$"
+    )
+    _CHANGE_RE = re.compile(r"^\s*([+\-~])\s+([A-Za-z0-9][\w.\-]*)==(\S+)")
+    _DURATION_RE = re.compile(r"([\d.]+)\s*(ms|s|m)\b")
+
+    def __init__(self, uv_cmd: list[str], cwd: Path, env: dict = None):
+        self.t0 = time.perf_counter()
+        self.phases: dict[str, dict] = {}
+        self.changes: dict[str, list[str]] = {"added": [], "removed": [], "reinstalled": []}
+        self.cache_dir = self._cache_dir(uv_cmd, cwd, env)
+        self._before = self._archive_entries()
+
+    @staticmethod
+    def _cache_dir(uv_cmd: list[str], cwd: Path, env: dict = None) -> Optional[Path]:
+        raw = (env or os.environ).get("UV_CACHE_DIR")
+        if not raw:
+            try:
+                raw = subprocess.run(
+                    uv_cmd + ["cache", "dir"], cwd=str(cwd), env=env, capture_output=True, text=True, timeout=10
+                ).stdout.strip()
+            except (OSError, subprocess.TimeoutExpired):
+                raw = ""
+        return Path(raw) if raw else None
+
+    def _archive_entries(self) -> set:
+        if self.cache_dir is None:
+            return set()
+        out = set()
+        for bucket in self.cache_dir.glob("archive-v*"):
+            with contextlib.suppress(OSError):
+                out.update(e.path for e in os.scandir(bucket))
+        return out
+
+    @staticmethod
+    def _seconds(text: str) -> float:
+        total = 0.0
+        for num, unit in UvSyncReport._DURATION_RE.findall(text):
+            total += float(num) * {"ms": 0.001, "s": 1.0, "m": 60.0}[unit]
+        return round(total, 3)
+
+    def feed(self, line: str):
+        line = line.rstrip()
+        m = self._SUMMARY_RE.match(line)
+        if m:
+            self.phases[m.group(1).lower()] = {"packages": int(m.group(2)), "seconds": self._seconds(m.group(3))}
+            return
+        m = self._CHANGE_RE.match(line)
+        if m:
+            kind = {"+": "added", "-": "removed", "~": "reinstalled"}[m.group(1)]
+            self.changes[kind].append(f"{m.group(2)}=={m.group(3)}")
+
+    def finish(self, project_root: Path, command: list[str], rc: int) -> dict:
+        new_entries = self._archive_entries() - self._before
+        prepared = self.phases.get("prepared", {}).get("packages", 0)
+        installed = self.phases.get("installed", {}).get("packages", 0)
+        report = {
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "host": platform.node(),
+            "platform": f"{sys.platform}-{platform.machine().lower()}",
+            "command": " ".join(command),
+            "returncode": rc,
+            "wall_seconds": round(time.perf_counter() - self.t0, 3),
+            "phases": self.phases,
+            "packages": {
+                "downloaded_or_built": prepared,
+                "from_cache": max(installed - prepared, 0),
+                **{k: sorted(v) for k, v in self.changes.items()},
+            },
+            "cache_added_bytes": sum(CacheCleaner._dir_size(p) for p in new_entries),
+        }
+        out = project_root / StartupProfiler.DIR_NAME / self.FILE_NAME
+        try:
+            out.parent.mkdir(parents=True, exist_ok=True)
+            with open(out, "a", encoding="utf-8") as fp:
+                fp.write(json.dumps(report, ensure_ascii=False) + "\n")
+        except OSError as e:
+            ConsolePrinter.print(self.name, f"Failed to write {out}: {e}")
+        breakdown = ", ".join(f"{k} {v['seconds']:.1f}s" for k, v in self.phases.items()) or "no summary lines"
+        ConsolePrinter.print(
+            self.name,
+            f"{breakdown}; {prepared} downloaded/built, {report['packages']['from_cache']} from cache, "
+            f"+{CacheCleaner._fmt_bytes(report['cache_added_bytes'])} cache; appended to {out}",
+        )
+        return report
+
+
 class BackendInstaller:
     name = "BackendInstaller"
 
@@ -375,6 +2515,21 @@ class BackendInstaller:
         except Exception:
             return None
 
+    @staticmethod
+    def _resolve_uv_cmd_cached(manifest: "LaunchManifest" = None) -> list[str] | None:
+        """在 _resolve_uv_cmd 之上加一层清单缓存：上次定位到的 uv 仍在且未变（以及 PATH 未变）则直接复用。"""
+        if manifest is None:
+            return BackendInstaller._resolve_uv_cmd()
+        path_env = os.environ.get("PATH", "")
+        prev = manifest.previous("uv_cmd")
+        if prev:
+            if manifest.lookup("uv_cmd", LaunchManifest.fingerprint(prev[0], extra=path_env)) == prev:
+                return prev
+        uv_cmd = BackendInstaller._resolve_uv_cmd()
+        if uv_cmd:
+            manifest.record("uv_cmd", LaunchManifest.fingerprint(uv_cmd[0], extra=path_env), uv_cmd)
+        return uv_cmd
+
     @staticmethod
     def _venv_python(venv_dir: Path) -> Path:
         return venv_dir / ("Scripts" if os.name == "nt" else "bin") / ("python.exe" if os.name == "nt" else "python")
@@ -385,44 +2540,37 @@ class BackendInstaller:
         return venv_dir.exists() and py.exists()
 
     @staticmethod
-    def _read_text_safely(p: Path) -> str:
-        try:
-            return p.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            return ""
-
-    @staticmethod
-    def _locks_unchanged(backend_dir: Path, venv_dir: Path) -> bool:
+    def _offline_sync(
+        uv_cmd: list[str], backend_dir: Path, venv_dir: Path, env: dict, on_line: Callable[[str], object] = None
+    ) -> int:
         """
-        若 .venv 存在，且 .venv.stamp 与 uv.lock 内容一致，则视为依赖未变，可跳过安装/同步。
+        离线安装：锁文件已在构建 wheelhouse 时导出为 requirements.txt，
+        这里只用 uv venv + uv pip sync 从本地目录安装，不访问任何索引。
         """
-        lock = backend_dir / "uv.lock"
-        stamp = venv_dir / ".venv.stamp"
-        if not (lock.exists() and stamp.exists()):
-            return False
-        return BackendInstaller._read_text_safely(lock) == BackendInstaller._read_text_safely(stamp)
-
-    @staticmethod
-    def _write_stamp(backend_dir: Path, venv_dir: Path):
-        lock = backend_dir / "uv.lock"
-        stamp = venv_dir / ".venv.stamp"
-        try:
-            if lock.exists():
-                stamp.write_text(lock.read_text(encoding="utf-8", errors="ignore"), encoding="utf-8")
-        except Exception:
-            pass
+        d = Bootstrapper.wheel_path()
+        offline = ["--offline", "--no-index", "--find-links", str(d)]
+        if not BackendInstaller._venv_ready(venv_dir):
+            pyver = Wheelhouse.load_manifest(d)["python"]
+            rc = SubprocessStreamer.run(
+                uv_cmd + ["venv", str(venv_dir), "--python", pyver, "--offline"], prefix="uv", env=env, cwd=backend_dir
+            )
+            if rc != 0:
+                return rc
+        cmd = uv_cmd + ["pip", "sync", str(d / Wheelhouse.REQUIREMENTS)]
+        cmd += ["--python", str(BackendInstaller._venv_python(venv_dir))]
+        return SubprocessStreamer.run(cmd + offline, prefix="uv", env=env, cwd=backend_dir, on_line=on_line)
 
     @staticmethod
-    def install(project_root: Path) -> Path:
+    def install(project_root: Path, config: LayeredConfig, manifest: "LaunchManifest" = None) -> Path:
         """
         行为策略（从最“保守跳过”到“强制同步”的优先级）：
         1) BACKEND_SKIP_INSTALL=1 且 .venv 就绪  -> 直接跳过
-        2) .venv 存在 且 锁文件未变（.venv.stamp 与 uv.lock 相同） -> 跳过
+        2) .venv 存在 且 指纹一致（VenvFingerprint：锁文件/pyproject 哈希、解释器、site-packages 抽样） -> 跳过
         3) 否则运行 `uv sync`（可能会下载，取决于本地缓存/锁变化）
         """
         backend_dir = project_root / "backend"
         venv_dir = backend_dir / ".venv"
-        os.chdir(backend_dir)
+        run_env = config.service_env("backend", {"ENV": "DEV"})  # 与 BackendService 启动 uvicorn 时一致，供预编译计时
 
         # 1) 强力跳过开关
         if os.getenv("BACKEND_SKIP_INSTALL", "").strip().lower() in ("1", "true", "yes"):
@@ -436,17 +2584,52 @@ class BackendInstaller:
                     "BACKEND_SKIP_INSTALL=1 但 .venv 不存在或不完整 => 无法跳过，将继续检查锁文件机制/执行安装",
                 )
 
-        # 2) 锁文件未变 & venv 存在 -> 跳过
-        if BackendInstaller._venv_ready(venv_dir) and BackendInstaller._locks_unchanged(backend_dir, venv_dir):
-            ConsolePrinter.print(
-                BackendInstaller.name, "Backend deps unchanged (uv.lock matches .venv.stamp) -> skip uv sync"
-            )
+        # 2) 指纹一致 & venv 存在 -> 跳过（锁文件 stat 未变时不重新哈希）
+        if not BackendInstaller._venv_ready(venv_dir):
+            reason = ".venv missing or incomplete (no python)"
+        else:
+            reason = VenvFingerprint.check(backend_dir, venv_dir)
+        if reason is None:
+            ConsolePrinter.print(BackendInstaller.name, "Backend deps unchanged (fingerprint match) -> skip uv sync")
+            # 上次预编译未完成（或刚升级启动器）时补做一次
+            BytecodePrecompiler.run(backend_dir, venv_dir, run_env)
             ConsolePrinter.print(BackendInstaller.name, "Virtual environment ready")
             return venv_dir
+        ConsolePrinter.print(BackendInstaller.name, f"Re-sync needed: {reason}")
 
-        # 3) 需要同步安装
-        uv_cmd = BackendInstaller._resolve_uv_cmd()
-        if uv_cmd is None:
+        # 2.5) 快照库中有相同锁文件的 .venv -> 克隆恢复并重新校验
+        store = VenvSnapshotStore(project_root) if VenvSnapshotStore.enabled() else None
+        if store is not None and store.restore(VenvSnapshotStore.key(backend_dir), venv_dir):
+            if not BackendInstaller._venv_ready(venv_dir):
+                reason = "restored snapshot has no python"
+            else:
+                reason = VenvFingerprint.check(backend_dir, venv_dir)
+            if reason is None:
+                BytecodePrecompiler.run(backend_dir, venv_dir, run_env)
+                ConsolePrinter.print(BackendInstaller.name, "Virtual environment ready")
+                return venv_dir
+            ConsolePrinter.print(BackendInstaller.name, f"Snapshot did not validate ({reason}), running uv sync")
+
+        # 3) 需要同步安装（离线模式先校验 wheel 目录，有问题立即失败）
+        uv_cmd = BackendInstaller._resolve_uv_cmd_cached(manifest)
+        offline = Wheelhouse.offline()
+        if offline:
+            problems = Wheelhouse.verify(backend_dir, need_uv=uv_cmd is None)
+            for p in problems:
+                ConsolePrinter.print(Wheelhouse.name, p)
+            if problems:
+                sys.exit(1)
+        if uv_cmd is None and offline:
+            ConsolePrinter.print(BackendInstaller.name, "uv not found, installing from wheelhouse...")
+            find_links = ["--no-index", "--find-links", str(Bootstrapper.wheel_path())]
+            subprocess.run(
+                [sys.executable, "-m", "pip", "install", *find_links, "uv"],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            uv_cmd = BackendInstaller._resolve_uv_cmd_cached(manifest)
+        elif uv_cmd is None:
             ConsolePrinter.print(BackendInstaller.name, "uv not found, installing with pip (user)...")
             try:
                 subprocess.run(
@@ -462,7 +2645,7 @@ class BackendInstaller:
                     capture_output=True,
                     text=True,
                 )
-            uv_cmd = BackendInstaller._resolve_uv_cmd()
+            uv_cmd = BackendInstaller._resolve_uv_cmd_cached(manifest)
 
         if uv_cmd is None:
             ConsolePrinter.print(BackendInstaller.name, "Failed to locate 'uv' after installation.")
@@ -471,56 +2654,237 @@ class BackendInstaller:
         ConsolePrinter.print(BackendInstaller.name, f"Using uv command: {' '.join(uv_cmd)}")
         ConsolePrinter.print(BackendInstaller.name, "Installing backend dependencies...")
 
-        env = os.environ.copy()
-        # 强制复制，避免硬链接警告；如需进一步加速，可把 UV_CACHE_DIR 指到与项目同盘
-        env.setdefault("UV_LINK_MODE", "copy")
+        env = os.environ.copy()
+        # uv 缓存放到与项目同卷的位置，按文件系统选择 reflink / hardlink，仅跨卷时复制
+        StorePlacement.apply_uv(env, project_root)
+
+        report = UvSyncReport(uv_cmd, backend_dir, env)
+        if offline:
+            rc = BackendInstaller._offline_sync(uv_cmd, backend_dir, venv_dir, env, on_line=report.feed)
+        else:
+            rc = SubprocessStreamer.run(uv_cmd + ["sync"], prefix="uv", env=env, cwd=backend_dir, on_line=report.feed)
+        report.finish(project_root, uv_cmd + (["pip", "sync"] if offline else ["sync"]), rc)
+        if rc != 0:
+            ConsolePrinter.print(BackendInstaller.name, f"Failed to sync backend dependencies (uv). Return code={rc}")
+            sys.exit(1)
+
+        ConsolePrinter.print(BackendInstaller.name, "Backend dependencies installed successfully")
+
+        # 校验 venv
+        if not BackendInstaller._venv_ready(venv_dir):
+            ConsolePrinter.print(BackendInstaller.name, "Virtual environment not created or python missing")
+            sys.exit(1)
+
+        # 写入指纹记录并预编译，再以（可能被 uv sync 更新后的）锁文件为键保存快照（快照内含 .pyc）
+        VenvFingerprint.write(backend_dir, venv_dir, VenvFingerprint.load(venv_dir))
+        BytecodePrecompiler.run(backend_dir, venv_dir, run_env)
+        if store is not None:
+            inputs = (VenvFingerprint.load(venv_dir) or {}).get("inputs")
+            store.save(VenvSnapshotStore.key(backend_dir, inputs), venv_dir)
+
+        ConsolePrinter.print(BackendInstaller.name, "Virtual environment ready")
+        return venv_dir
+
+
+class PnpmResolver:
+    """
+    pnpm 只准备一次，之后直接 `node <pnpm.cjs>` 运行，不再每次 `npm exec --yes pnpm@9`：
+    1) 入口缓存：进程内 + LaunchManifest（入口文件与 node.exe 未变即复用）
+    2) 工具目录（MMA_TOOLS_DIR，默认本机缓存目录下 mma-launcher/tools）已有 pnpm-<版本>/ -> 直接使用
+    3) 否则依次尝试固定版本的 tarball 解压：PNPM_TARBALL / 工具目录 / wheelhouse 中的 pnpm-<版本>*.tgz（完全离线），
+       都不可用时由 npm pack 下载一次；npm 布局（package/bin/pnpm.cjs）与 corepack pack 布局
+       （pnpm/<版本>/bin/pnpm.cjs）均可识别，解压后找不到入口的工具目录 tarball 会被删除
+    4) 全部失败时退回 npm exec（旧行为），且本进程内不再重试（离线机器上不会每次安装/启动/重启都去下载）；
+       下载最多等待 PNPM_FETCH_TIMEOUT 秒（默认 120）；PNPM_VERSION 指定版本（默认 9）
+    """
+
+    name = "Pnpm"
+    _cache: dict = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def spec() -> str:
+        return os.getenv("PNPM_VERSION", "9").strip() or "9"
+
+    @staticmethod
+    def tools_dir() -> Path:
+        raw = os.getenv("MMA_TOOLS_DIR", "").strip()
+        if raw:
+            return Path(raw).expanduser()
+        if os.name == "nt":
+            base = Path(os.getenv("LOCALAPPDATA") or Path.home() / "AppData" / "Local")
+        else:
+            base = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache")
+        return base / "mma-launcher" / "tools"
+
+    @staticmethod
+    def _find_tarballs(spec: str) -> list[Path]:
+        """候选 tarball（按优先级）；同一目录内有多个时取最新修改的一个。"""
+        found = []
+        raw = os.getenv("PNPM_TARBALL", "").strip()
+        if raw and Path(raw).is_file():
+            found.append(Path(raw))
+        for d in (PnpmResolver.tools_dir(), Bootstrapper.wheel_path()):
+            hits = [p for p in d.glob(f"pnpm-{spec}*.tgz") if p.is_file()] if d.is_dir() else []
+            if hits:
+                found.append(max(hits, key=lambda p: p.stat().st_mtime))
+        return found
+
+    @staticmethod
+    def _entry(dest: Path) -> Optional[Path]:
+        """npm pack 布局为 package/bin/pnpm.cjs；corepack pack 布局为 pnpm/<版本>/bin/pnpm.cjs。"""
+        entry = dest / "package" / "bin" / "pnpm.cjs"
+        if entry.exists():
+            return entry
+        found = sorted(dest.glob("pnpm/*/bin/pnpm.cjs")) if dest.is_dir() else []
+        return found[-1] if found else None
+
+    @staticmethod
+    def _download(npm_path: Path, spec: str, env: dict, registry: str) -> Optional[Path]:
+        tools = PnpmResolver.tools_dir()
+        tools.mkdir(parents=True, exist_ok=True)
+        cmd = [str(npm_path)] + (["--registry", registry] if registry else [])
+        cmd += ["pack", f"pnpm@{spec}", "--prefer-offline", "--pack-destination", str(tools)]
+        timeout = float(os.getenv("PNPM_FETCH_TIMEOUT", "120") or 120)
+        # 输出写临时文件而非管道：超时后 npm.cmd 下的 node 孙进程不会因占着管道而让等待卡住；超时则结束整棵进程树
+        with tempfile.TemporaryFile() as out:
+            try:
+                proc = subprocess.Popen(cmd, env=env, cwd=str(tools), stdout=out, stderr=subprocess.DEVNULL)
+                rc = proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                ProcessUtils.terminate_tree(proc.pid)
+                ConsolePrinter.print(PnpmResolver.name, f"npm pack pnpm@{spec} timed out after {timeout:.0f}s")
+                return None
+            except OSError as e:
+                ConsolePrinter.print(PnpmResolver.name, f"npm pack pnpm@{spec} failed: {e}")
+                return None
+            out.seek(0)
+            lines = out.read().decode("utf-8", errors="replace").strip().splitlines()
+        if rc == 0 and lines and (tools / lines[-1].strip()).exists():
+            return tools / lines[-1].strip()
+        return None
+
+    @staticmethod
+    def _extract(tarball: Path, dest: Path) -> bool:
+        import tarfile
+
+        tmp = dest.with_name(f"{dest.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        try:
+            with tarfile.open(tarball) as tf:
+                if hasattr(tarfile, "data_filter"):
+                    tf.extractall(tmp, filter="data")
+                else:
+                    tf.extractall(tmp)
+            # 上次残留的（不完整或布局不对的）目录会让 os.replace 失败，先清掉
+            shutil.rmtree(dest, ignore_errors=True)
+            os.replace(tmp, dest)
+            return True
+        except (OSError, tarfile.TarError) as e:
+            ConsolePrinter.print(PnpmResolver.name, f"Failed to extract {tarball}: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+
+    @staticmethod
+    def _provision(npm_path: Path, env: dict, registry: str) -> Optional[Path]:
+        spec = PnpmResolver.spec()
+        tools = PnpmResolver.tools_dir()
+        dest = tools / f"pnpm-{spec}"
+        entry = PnpmResolver._entry(dest)
+        if entry is not None:
+            return entry
+        dest.parent.mkdir(parents=True, exist_ok=True)
+
+        def attempt(tarball: Path) -> Optional[Path]:
+            found = PnpmResolver._entry(dest) if PnpmResolver._extract(tarball, dest) else None
+            if found is not None:
+                ConsolePrinter.print(PnpmResolver.name, f"pnpm@{spec} ready at {found} (from {tarball.name})")
+                return found
+            ConsolePrinter.print(PnpmResolver.name, f"{tarball.name} does not contain bin/pnpm.cjs, skipped")
+            # 工具目录里的坏 tarball 会在下次启动时再被选中，直接删除；用户提供的文件不动
+            if tarball.parent == tools:
+                with contextlib.suppress(OSError):
+                    tarball.unlink()
+            return None
 
-        try:
-            subprocess.run(uv_cmd + ["sync"], check=True, text=True, env=env)
-        except subprocess.CalledProcessError as e:
-            ConsolePrinter.print(
-                BackendInstaller.name, f"Failed to sync backend dependencies (uv). Return code={e.returncode}"
-            )
-            sys.exit(1)
+        for tarball in PnpmResolver._find_tarballs(spec):
+            entry = attempt(tarball)
+            if entry is not None:
+                return entry
+        ConsolePrinter.print(PnpmResolver.name, f"Fetching pnpm@{spec} once into {tools} ...")
+        tarball = PnpmResolver._download(npm_path, spec, env, registry)
+        return attempt(tarball) if tarball is not None else None
 
-        ConsolePrinter.print(BackendInstaller.name, "Backend dependencies installed successfully")
+    @staticmethod
+    def version(cmd: list[str], direct: bool) -> str:
+        """直接运行时读取入口旁的 package.json；npm exec 时只能给出版本范围。"""
+        if direct:
+            try:
+                pkg = Path(cmd[1]).parents[1] / "package.json"
+                return json.loads(pkg.read_text(encoding="utf-8")).get("version", "?")
+            except (OSError, ValueError, IndexError):
+                return "?"
+        return f"pnpm@{PnpmResolver.spec()}"
 
-        # 校验 venv
-        if not BackendInstaller._venv_ready(venv_dir):
-            ConsolePrinter.print(BackendInstaller.name, "Virtual environment not created or python missing")
-            sys.exit(1)
+    @staticmethod
+    def _known_entry(node_exe: Path, spec: str, manifest: "LaunchManifest" = None) -> Optional[Path]:
+        """不触发下载：清单记录的入口或工具目录中已解压的入口。"""
+        if manifest is not None:
+            prev = manifest.previous("pnpm_entry")
+            if prev and manifest.lookup("pnpm_entry", LaunchManifest.fingerprint(prev, node_exe, extra=spec)):
+                return Path(prev)
+        return PnpmResolver._entry(PnpmResolver.tools_dir() / f"pnpm-{spec}")
 
-        # 写入哨兵：记录当前锁文件状态
-        BackendInstaller._write_stamp(backend_dir, venv_dir)
+    @staticmethod
+    def known_version(nodejs_path: str, manifest: "LaunchManifest" = None) -> Optional[str]:
+        """已确定的 pnpm 版本（不下载）；本进程尚未解析且本地没有已准备好的 pnpm 时返回 None。"""
+        node_exe = Path(nodejs_path) / "node.exe"
+        spec = PnpmResolver.spec()
+        with PnpmResolver._lock:
+            if (str(node_exe), spec) in PnpmResolver._cache:
+                entry = PnpmResolver._cache[(str(node_exe), spec)]
+                if entry is None:
+                    return PnpmResolver.version([], False)
+            else:
+                entry = PnpmResolver._known_entry(node_exe, spec, manifest)
+        if entry is None:
+            return None
+        return PnpmResolver.version([str(node_exe), str(entry)], True)
 
-        ConsolePrinter.print(BackendInstaller.name, "Virtual environment ready")
-        return venv_dir
+    @staticmethod
+    def command(nodejs_path: str, env: dict, registry: str = "", manifest: "LaunchManifest" = None) -> tuple:
+        """返回 (命令前缀, 是否直接运行)；直接运行时参数原样传给 pnpm，退回 npm exec 时由 npm 解析。"""
+        node_exe = Path(nodejs_path) / "node.exe"
+        npm_path = Path(nodejs_path) / "npm.cmd"
+        spec = PnpmResolver.spec()
+        fallback = [str(npm_path)] + (["--registry", registry] if registry else [])
+        fallback += ["exec", "--yes", f"pnpm@{spec}"]
+        key = (str(node_exe), spec)
+        with PnpmResolver._lock:
+            if key in PnpmResolver._cache:
+                # 失败结果（None）同样缓存：本进程内直接退回 npm exec，不再重复下载
+                entry = PnpmResolver._cache[key]
+                return ([str(node_exe), str(entry)], True) if entry is not None else (fallback, False)
+            entry = PnpmResolver._known_entry(node_exe, spec, manifest)
+            if entry is None:
+                with PROFILER.span("pnpm:provision"):
+                    entry = PnpmResolver._provision(npm_path, env, registry)
+                if entry is not None and manifest is not None:
+                    manifest.record("pnpm_entry", LaunchManifest.fingerprint(entry, node_exe, extra=spec), str(entry))
+            PnpmResolver._cache[key] = entry
+            if entry is not None:
+                return [str(node_exe), str(entry)], True
+        ConsolePrinter.print(PnpmResolver.name, f"Could not provision pnpm@{spec}, falling back to npm exec")
+        return fallback, False
 
 
 class FrontendInstaller:
     name = "FrontendInstaller"
 
-    @staticmethod
     @staticmethod
     def _stream(cmd, env, cwd=None):
-        # === 新增：定义需忽略的噪声行模式 ===
-        NOISE_PATTERNS = [
-            r"^Source path:\s+.*frontend[\\/].*\.vue\?vue&type=style.*$",  # 你的这类 "Source path: ... .vue?vue&type=style..."
-            r"^\s*JIT TOTAL:\s+\d+(\.\d+)?ms\s*$",  # "JIT TOTAL: 31.995ms"
-        ]
-        _noise = [re.compile(p) for p in NOISE_PATTERNS]
-
-        proc = subprocess.Popen(
-            cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1
-        )
-        assert proc.stdout is not None
-        for line in proc.stdout:
-            # === 新增：匹配则跳过打印 ===
-            if any(rx.search(line) for rx in _noise):
-                continue
-            print(line.rstrip("\n"), flush=True)
-        proc.wait()
-        return proc.returncode
+        # 噪声行（"Source path: ... .vue?vue&type=style..."、"JIT TOTAL: 31.995ms" 等）由 LogFilter 统一过滤
+        return SubprocessStreamer.run(cmd, prefix="pnpm", env=env, cwd=cwd)
 
     @staticmethod
     def _policy_from_env(cfg: ConfigManager) -> str:
@@ -543,13 +2907,61 @@ class FrontendInstaller:
             return int(raw)
         return 0
 
+    STAMP_NAME = ".mma_install_stamp.json"
+
+    @staticmethod
+    def _node_version(node_path: Path, env: dict, manifest: "LaunchManifest" = None) -> str:
+        fp = LaunchManifest.fingerprint(node_path)
+        cached = manifest.lookup("node_version", fp) if manifest is not None else None
+        if cached:
+            return cached
+        try:
+            out = subprocess.run([str(node_path), "--version"], env=env, capture_output=True, text=True, timeout=15)
+            version = (out.stdout or "").strip() or "?"
+        except (OSError, subprocess.TimeoutExpired):
+            return "?"
+        if manifest is not None:
+            manifest.record("node_version", fp, version)
+        return version
+
+    @staticmethod
+    def _stamp_values(frontend_dir: Path, node_version: str, pnpm_version: str) -> dict:
+        return {
+            "pnpm-lock.yaml": VenvFingerprint._sha256(frontend_dir / "pnpm-lock.yaml"),
+            "package.json": VenvFingerprint._sha256(frontend_dir / "package.json"),
+            "node": node_version,
+            "pnpm": pnpm_version,
+        }
+
+    @staticmethod
+    def _read_stamp(node_modules_dir: Path) -> Optional[dict]:
+        try:
+            return json.loads((node_modules_dir / FrontendInstaller.STAMP_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_stamp(node_modules_dir: Path, values: dict):
+        try:
+            (node_modules_dir / FrontendInstaller.STAMP_NAME).write_text(
+                json.dumps(values, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+        except OSError as e:
+            ConsolePrinter.print(FrontendInstaller.name, f"Failed to write install stamp: {e}")
+
     @staticmethod
-    def install(project_root: Path, nodejs_path: str, cfg: ConfigManager):
+    def install(project_root: Path, nodejs_path: str, cfg: ConfigManager, manifest: "LaunchManifest" = None):
+        """
+        以 node_modules/.mma_install_stamp.json（锁文件、package.json 哈希 + node / pnpm 版本）为准：
+        1) stamp 一致 -> 静默跳过
+        2) stamp 不一致 -> 原地 `pnpm install --frozen-lockfile` 增量安装，不删除任何文件、不弹窗
+        3) node_modules 不存在 -> 直接安装（FRONTEND_REINSTALL_POLICY=skip 时跳过）
+        4) node_modules 存在但没有 stamp（来源不明）-> 才按旧逻辑询问是否全量重装
+        """
         cfg.reload()
         ConsolePrinter.print(FrontendInstaller.name, f"Using .env at: {cfg.env_file}")
 
         frontend_dir = project_root / "frontend"
-        os.chdir(frontend_dir)
         npm_path = Path(nodejs_path) / "npm.cmd"
         node_path = Path(nodejs_path) / "node.exe"
 
@@ -567,24 +2979,56 @@ class FrontendInstaller:
         env.setdefault("FORCE_COLOR", "1")
         registry = os.getenv("NPM_REGISTRY", "").strip()
 
-        try:
-            subprocess.run(
-                [str(npm_path), "--version"],
-                check=True,
-                env=env,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-            )
-            ConsolePrinter.print(FrontendInstaller.name, "npm is functioning correctly")
-        except subprocess.CalledProcessError:
+        npm_fp = LaunchManifest.fingerprint(node_path, npm_path)
+        npm_version = manifest.lookup("npm_version", npm_fp) if manifest is not None else None
+        if npm_version:
+            ConsolePrinter.print(FrontendInstaller.name, f"npm {npm_version} (cached check)")
+        else:
+            try:
+                with PROFILER.span("subprocess:npm --version", kind="subprocess"):
+                    out = subprocess.run(
+                        [str(npm_path), "--version"],
+                        check=True,
+                        env=env,
+                        cwd=str(frontend_dir),
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.STDOUT,
+                        text=True,
+                    )
+                ConsolePrinter.print(FrontendInstaller.name, "npm is functioning correctly")
+                if manifest is not None:
+                    lines = (out.stdout or "").strip().splitlines()
+                    manifest.record("npm_version", npm_fp, lines[-1].strip() if lines else "?")
+            except subprocess.CalledProcessError:
+                ConsolePrinter.print(
+                    FrontendInstaller.name, "npm is not functioning correctly. Please check Node.js installation."
+                )
+                return
+
+        node_modules_dir = frontend_dir / "node_modules"
+        node_version = FrontendInstaller._node_version(node_path, env, manifest)
+        previous = FrontendInstaller._read_stamp(node_modules_dir) if node_modules_dir.exists() else None
+        # 先用不触发下载的 pnpm 版本比对 stamp（本地尚无已准备好的 pnpm 时沿用 stamp 中记录的版本），
+        # 一致则直接跳过，不去准备 pnpm
+        if previous is not None:
+            known = PnpmResolver.known_version(nodejs_path, manifest) or previous.get("pnpm")
+            if FrontendInstaller._stamp_values(frontend_dir, node_version, known) == previous:
+                ConsolePrinter.print(FrontendInstaller.name, "Frontend deps unchanged (install stamp match) -> skip")
+                return
+
+        pnpm_cmd, direct = PnpmResolver.command(nodejs_path, env, registry=registry, manifest=manifest)
+        stamp = FrontendInstaller._stamp_values(frontend_dir, node_version, PnpmResolver.version(pnpm_cmd, direct))
+        if previous == stamp:
+            ConsolePrinter.print(FrontendInstaller.name, "Frontend deps unchanged (install stamp match) -> skip")
+            return
+        if previous is not None:
+            changed = [k for k in stamp if previous.get(k) != stamp[k]]
             ConsolePrinter.print(
-                FrontendInstaller.name, "npm is not functioning correctly. Please check Node.js installation."
+                FrontendInstaller.name, f"{', '.join(changed)} changed -> incremental pnpm install in place"
             )
+            FrontendInstaller._run_install(project_root, pnpm_cmd, direct, registry, env, node_modules_dir, stamp)
             return
 
-        node_modules_dir = frontend_dir / "node_modules"
-
         has_policy = cfg.exists("FRONTEND_REINSTALL_POLICY")
         policy = FrontendInstaller._policy_from_env(cfg)
         is_first_prompt = not has_policy
@@ -620,52 +3064,105 @@ class FrontendInstaller:
                     FrontendInstaller.name, "选择了 否：本次跳过，并将以后默认跳过（FRONTEND_REINSTALL_POLICY=skip）"
                 )
                 return
-            try:
-                ConsolePrinter.print(FrontendInstaller.name, "Removing existing node_modules for a clean reinstall...")
-                shutil.rmtree(node_modules_dir, ignore_errors=True)
-            except Exception as e:
-                ConsolePrinter.print(FrontendInstaller.name, f"Failed to remove node_modules: {e}")
-            FrontendInstaller._persist_policy(cfg, "prompt")
-        else:
-            if policy == "skip":
-                ConsolePrinter.print(
-                    FrontendInstaller.name, "node_modules 不存在，但 policy=skip ➜ 跳过安装（可手动执行一次安装）"
-                )
-                return
-            ans = Dialogs.yes_no_cancel(
-                "安装前端依赖",
-                "未检测到 frontend/node_modules，是否现在下载并安装依赖？\n"
-                "是 = 立即安装\n否 = 跳过并记住以后默认跳过\n取消 = 退出脚本",
-                timeout_sec=timeout_for_dialog,
-                default="yes",
-                icon_emoji="📦",
-                theme="flatly",
-            )
-            if ans == "cancel":
-                ConsolePrinter.print(FrontendInstaller.name, "User canceled. Exiting.")
-                sys.exit(1)
-            if ans == "no":
-                FrontendInstaller._persist_policy(cfg, "skip")
+            # 原子移走旧目录后立即安装到全新目录，旧树由后台并行删除（未删完的留在回收站，下次再回收）
+            # hold=True：删除期间后台 reap 进程（如后端快照恢复触发的）不会同时处理这个会话
+            trash = TrashBin(project_root, hold=True)
+            moved = trash.move(node_modules_dir)
+            if moved is not None:
+                ConsolePrinter.print(FrontendInstaller.name, f"Moved old node_modules aside to {moved}")
+                ParallelDeleter(moved, "old node_modules").start(on_done=trash.release)
+            else:
+                trash.release()
                 ConsolePrinter.print(
-                    FrontendInstaller.name, "选择了 否：本次跳过，并将以后默认跳过（FRONTEND_REINSTALL_POLICY=skip）"
+                    FrontendInstaller.name, "Cannot rename node_modules (files in use?), deleting it in place..."
                 )
-                return
+                if not ParallelDeleter(node_modules_dir, "node_modules").run():
+                    ConsolePrinter.print(FrontendInstaller.name, "node_modules only partially removed")
+                    sys.exit(1)
             FrontendInstaller._persist_policy(cfg, "prompt")
+        elif policy == "skip":
+            ConsolePrinter.print(
+                FrontendInstaller.name, "node_modules 不存在，但 policy=skip ➜ 跳过安装（可手动执行一次安装）"
+            )
+            return
 
-        cmd = [str(npm_path)]
-        if registry:
+        FrontendInstaller._run_install(project_root, pnpm_cmd, direct, registry, env, node_modules_dir, stamp)
+
+    @staticmethod
+    def _run_install(
+        project_root: Path, pnpm_cmd: list, direct: bool, registry: str, env: dict, node_modules_dir: Path, stamp: dict
+    ):
+        frontend_dir = node_modules_dir.parent
+        cmd = pnpm_cmd + ["install", "--prefer-offline"]
+        # 有锁文件时严格按锁安装（锁与 package.json 不一致时直接报错，而不是悄悄改锁）
+        if stamp["pnpm-lock.yaml"] is not None:
+            cmd.append("--frozen-lockfile")
+        if direct and registry:
             cmd += ["--registry", registry]
-        cmd += ["exec", "--yes", "pnpm@9", "install", "--prefer-offline"]
+        cmd += StorePlacement.pnpm_args(project_root)
 
         ConsolePrinter.print(FrontendInstaller.name, "Installing frontend dependencies with pnpm ...")
         rc = FrontendInstaller._stream(cmd, env=env, cwd=str(frontend_dir))
         if rc == 0:
+            FrontendInstaller._write_stamp(node_modules_dir, stamp)
             ConsolePrinter.print(FrontendInstaller.name, "Frontend dependencies installed successfully")
         else:
             ConsolePrinter.print(FrontendInstaller.name, f"Failed to install frontend dependencies, exit code {rc}")
             sys.exit(1)
 
 
+class InstallPhase:
+    """
+    并行安装阶段：后端 (uv sync) 与前端 (pnpm install) 互不依赖，放到两个工作线程里同时执行。
+    1) 各安装器的子进程输出带前缀（[uv] / [pnpm]）交错显示
+    2) 结束后统一打印一份报告：每项耗时、是否成功、失败原因
+    3) INSTALL_PARALLEL=0 时退回串行（便于排查交互/输出问题）
+    """
+
+    name = "InstallPhase"
+
+    @staticmethod
+    def _parallel_enabled() -> bool:
+        return os.getenv("INSTALL_PARALLEL", "1").strip().lower() not in ("0", "false", "no")
+
+    @staticmethod
+    def _run_one(label: str, task: Callable[[], object]) -> dict:
+        t0 = time.perf_counter()
+        try:
+            with PROFILER.span(f"install:{label}"):
+                task()
+            return {"ok": True, "error": "", "elapsed": time.perf_counter() - t0}
+        except SystemExit as e:
+            # 安装器内部失败时走 sys.exit(1)；在工作线程中将其转为失败记录，由主线程统一退出
+            return {"ok": False, "error": f"exit code {e.code}", "elapsed": time.perf_counter() - t0}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}", "elapsed": time.perf_counter() - t0}
+
+    @staticmethod
+    def run(tasks: dict[str, Callable[[], object]]) -> dict[str, dict]:
+        t0 = time.perf_counter()
+        if InstallPhase._parallel_enabled() and len(tasks) > 1:
+            ConsolePrinter.print(InstallPhase.name, f"Running {', '.join(tasks)} in parallel ...")
+            with ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="install") as pool:
+                futures = {label: pool.submit(InstallPhase._run_one, label, task) for label, task in tasks.items()}
+                report = {label: fut.result() for label, fut in futures.items()}
+        else:
+            report = {label: InstallPhase._run_one(label, task) for label, task in tasks.items()}
+        total = time.perf_counter() - t0
+
+        for label, r in report.items():
+            status = "ok" if r["ok"] else f"FAILED ({r['error']})"
+            ConsolePrinter.print(InstallPhase.name, f"{label:<10} {r['elapsed']:7.2f}s  {status}")
+        serial = sum(r["elapsed"] for r in report.values())
+        ConsolePrinter.print(InstallPhase.name, f"Install phase finished in {total:.2f}s (serial sum {serial:.2f}s)")
+
+        failed = [label for label, r in report.items() if not r["ok"]]
+        if failed:
+            ConsolePrinter.print(InstallPhase.name, f"Install failed: {', '.join(failed)}")
+            sys.exit(1)
+        return report
+
+
 # ========= 进程/端口与服务模块化 =========
 class ProcessUtils:
     name = "ProcessUtils"
@@ -761,12 +3258,72 @@ class PortGuard:
                 sys.exit(1)
             ConsolePrinter.print(self.name, f"Port {port} freed.")
 
-    def wait_until_open(self, port: int, attempts: int = 30, sleep: float = 1.0) -> bool:
-        for _ in range(attempts):
+    def wait_until_open(
+        self,
+        port: int,
+        attempts: int = 30,
+        sleep: float = 1.0,
+        cancel: Optional[threading.Event] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        轮询端口直到可连接。
+        1) timeout 给定时按截止时间计算（忽略 attempts），否则按 attempts 次数
+        2) cancel 被置位时立即返回 False（用于依赖图中其它节点失败后的取消）
+        """
+        with PROFILER.span(f"wait_until_open:{port}", kind="wait"):
+            return self._wait_until_open(port, attempts, sleep, cancel, timeout)
+
+    def _wait_until_open(self, port, attempts, sleep, cancel, timeout) -> bool:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        n = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                return False
             if self._is_open_localhost(port):
                 return True
-            time.sleep(sleep)
-        return False
+            n += 1
+            if deadline is None and n >= attempts:
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if cancel is not None:
+                cancel.wait(sleep)
+            else:
+                time.sleep(sleep)
+
+
+# === 子进程输出抓取器（常驻模式下用于 tail） ===
+class ProcStreamer:
+    """后台线程逐行读取子进程输出：经 LogFilter 过滤后回显到终端（带前缀），并保存最近若干行到环形缓冲。"""
+
+    # 抓取输出时 Popen 需要的参数
+    POPEN_KWARGS = dict(
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace", bufsize=1
+    )
+
+    def __init__(self, name: str, proc: subprocess.Popen, buffer: deque):
+        self.name = name
+        self.proc = proc
+        self.buffer = buffer
+        self.thread = threading.Thread(target=self._pump, name=f"pump-{name}", daemon=True)
+        self.thread.start()
+
+    def _pump(self):
+        log_filter = LogFilter(self.name)
+        try:
+            assert self.proc.stdout is not None
+            for line in self.proc.stdout:
+                for out in log_filter.process(line.rstrip("\r\n")):
+                    self.buffer.append(f"{TimeUtils.ts()} {out}")
+                    ConsolePrinter.raw_from_proc(self.name, out)
+            for out in log_filter.flush():
+                ConsolePrinter.raw_from_proc(self.name, out)
+            summary = log_filter.summary()
+            if summary:
+                ConsolePrinter.print(self.name, summary)
+        except Exception as e:
+            ConsolePrinter.print(self.name, f"[pump] error: {e}")
 
 
 class RedisService:
@@ -777,7 +3334,7 @@ class RedisService:
         self.port = port
         self.proc: Optional[subprocess.Popen] = None
 
-    def start(self, redis_path: str) -> bool:
+    def start(self, redis_path: str, cancel: Optional[threading.Event] = None, timeout: float = 30.0) -> bool:
         redis_server = Path(redis_path) / "redis-server.exe"
         if not redis_server.exists():
             Dialogs.yes_no_cancel("Redis 路径无效", f"未找到：{redis_server}", timeout_sec=0)
@@ -796,7 +3353,10 @@ class RedisService:
                 creationflags=subprocess.CREATE_NEW_CONSOLE,
                 cwd=str(redis_path),
             )
-            time.sleep(2)
+            if not self.port_guard.wait_until_open(self.port, sleep=0.2, cancel=cancel, timeout=timeout):
+                ConsolePrinter.print(self.name, f"Redis failed to start on port {self.port}")
+                self.stop()
+                return False
             ConsolePrinter.print(self.name, "Redis started successfully")
             return True
         except Exception as e:
@@ -813,13 +3373,19 @@ class RedisService:
 class BackendService:
     name = "BackendService"
 
-    def __init__(self, port_guard: PortGuard, port: int = 8000, host: str = "localhost"):
+    def __init__(
+        self, port_guard: PortGuard, config: LayeredConfig, port: int = 8000, host: str = "localhost"
+    ):
         self.port_guard = port_guard
+        self.config = config
         self.port = port
         self.host = host
         self.proc: Optional[subprocess.Popen] = None
+        self.capture = False  # 抓取输出：经 LogFilter 过滤后回显，并供 tail 使用
+        self.log: deque = deque(maxlen=1000)
+        self.stream: Optional[ProcStreamer] = None
 
-    def start(self, project_root: Path):
+    def start(self, project_root: Path, cancel: Optional[threading.Event] = None, timeout: float = 30.0):
         backend_dir = project_root / "backend"
 
         # 优先使用环境变量 BACKEND_PYTHON_EXE 指定的解释器（如果存在且有效）
@@ -855,13 +3421,9 @@ class BackendService:
         # 确保端口空闲
         self.port_guard.ensure_free(self.port)
 
-        # 读取后端环境
-        env_path_local = backend_dir / ".env.dev"
-        load_dotenv(dotenv_path=env_path_local, override=True)
-        ConsolePrinter.print(self.name, f"REDIS_URL set to {os.getenv('REDIS_URL')}")
-
-        env = os.environ.copy()
-        env["ENV"] = "DEV"
+        # 后端环境：基础进程环境 < 根 .env < backend/.env.dev，只作用于子进程
+        env = self.config.service_env("backend", {"ENV": "DEV"})
+        ConsolePrinter.print(self.name, f"REDIS_URL set to {env.get('REDIS_URL')}")
 
         ConsolePrinter.print(self.name, f"Starting backend server on {self.host}:{self.port} ...")
         self.proc = subprocess.Popen(
@@ -883,27 +3445,41 @@ class BackendService:
             cwd=str(backend_dir),
             env=env,
             creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == "nt" else 0,
+            **(ProcStreamer.POPEN_KWARGS if self.capture else {}),
         )
+        if self.capture:
+            self.stream = ProcStreamer("Uvicorn", self.proc, self.log)
 
-        if not self.port_guard.wait_until_open(self.port):
+        if not self.port_guard.wait_until_open(self.port, sleep=0.25, cancel=cancel, timeout=timeout):
             ConsolePrinter.print(self.name, f"Backend failed to start on port {self.port}")
             sys.exit(1)
         ConsolePrinter.print(self.name, f"Backend successfully started on port {self.port}")
 
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            ProcessUtils.terminate_tree(self.proc.pid)
+        self.proc = None
+        self.stream = None
+
 
 class FrontendService:
     name = "FrontendService"
 
-    def __init__(self, port_guard: PortGuard, nodejs_path: str, port: int = 5173, host: str = "localhost"):
+    def __init__(
+        self, port_guard: PortGuard, config: LayeredConfig, nodejs_path: str, port: int = 5173, host: str = "localhost"
+    ):
         self.port_guard = port_guard
+        self.config = config
         self.nodejs_path = nodejs_path
         self.port = port
         self.host = host
         self.proc: Optional[subprocess.Popen] = None
+        self.capture = False
+        self.log: deque = deque(maxlen=1000)
+        self.stream: Optional[ProcStreamer] = None
 
-    def start(self, project_root: Path):
+    def start(self, project_root: Path, cancel: Optional[threading.Event] = None, timeout: float = 30.0):
         frontend_dir = project_root / "frontend"
-        os.chdir(frontend_dir)
         npm_path = Path(self.nodejs_path) / "npm.cmd"
         node_exe = Path(self.nodejs_path) / "node.exe"
 
@@ -914,34 +3490,27 @@ class FrontendService:
         # 确保端口空闲
         self.port_guard.ensure_free(self.port)
 
-        env = os.environ.copy()
+        env = self.config.service_env("frontend")
         env["PATH"] = str(self.nodejs_path) + os.pathsep + env.get("PATH", "")
         env["NODE"] = str(node_exe)
         env.setdefault("FORCE_COLOR", "1")
 
+        # 直接运行已准备好的 pnpm 时参数原样传给脚本；退回 npm exec 时需要 "--" 让 npm 转交参数
+        pnpm, direct = PnpmResolver.command(self.nodejs_path, env, registry=os.getenv("NPM_REGISTRY", "").strip())
+        dev_args = ["--port", str(self.port), "--host", self.host, "--logLevel", "info"]  # "warn"
         ConsolePrinter.print(self.name, f"Starting frontend server on {self.host}:{self.port} ...")
         self.proc = subprocess.Popen(
-            [
-                str(npm_path),
-                "exec",
-                "--yes",
-                "pnpm@9",
-                "run",
-                "dev",
-                "--",
-                "--port",
-                str(self.port),
-                "--host",
-                self.host,
-                "--logLevel",
-                "info",  # "warn"
-            ],
+            pnpm + ["run", "dev"] + ([] if direct else ["--"]) + dev_args,
             shell=False,
             creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == "nt" else 0,
             env=env,
+            cwd=str(frontend_dir),
+            **(ProcStreamer.POPEN_KWARGS if self.capture else {}),
         )
+        if self.capture:
+            self.stream = ProcStreamer("Vite", self.proc, self.log)
 
-        if not self.port_guard.wait_until_open(self.port):
+        if not self.port_guard.wait_until_open(self.port, sleep=0.25, cancel=cancel, timeout=timeout):
             ConsolePrinter.print(self.name, f"Frontend failed to start on port {self.port}")
             sys.exit(1)
         ConsolePrinter.print(self.name, f"Frontend successfully started on port {self.port}")
@@ -950,15 +3519,192 @@ class FrontendService:
         if self.proc and self.proc.poll() is None:
             ProcessUtils.terminate_tree(self.proc.pid)
         self.proc = None
+        self.stream = None
 
 
 class ServiceSupervisor:
+    """
+    统一托管 redis / backend / frontend。
+    自动重启策略（set_policy）：
+    1) always：任何退出都重启；on-failure：仅非 0 退出码重启；never：不重启，直接整体关停（旧行为）
+    2) 重启前指数退避：backoff_base * 2^(n-1)，上限 backoff_max（n 为窗口内崩溃次数）
+    3) window 秒内崩溃超过 max_crashes 次视为 crash loop -> 仅此时升级为整体关停
+    """
+
     name = "Supervisor"
+    RESTART_POLICIES = ("always", "on-failure", "never")
 
     def __init__(self, backend: BackendService, frontend: FrontendService, redis: RedisService):
         self.backend = backend
         self.frontend = frontend
         self.redis = redis
+        # 重启与守护循环互斥：重启期间旧进程已退出，不应被判定为崩溃
+        self.lock = threading.RLock()
+        self.policies: dict[str, dict] = {}
+        self.stats: dict[str, dict] = {}
+        # 退出事件队列：每个被托管子进程一个阻塞 wait() 线程，退出时投递 (服务名, proc, 退出码)
+        self.events: "queue.Queue" = queue.Queue()
+
+    def watch(self, svc_name: str):
+        """为服务当前的子进程启动一个等待线程；进程退出后立即投递事件，无需轮询。"""
+        proc = self.services()[svc_name].proc
+        if proc is None:
+            return
+
+        def _wait():
+            rc = proc.wait()
+            self.events.put((svc_name, proc, rc))
+
+        threading.Thread(target=_wait, name=f"wait-{svc_name}", daemon=True).start()
+
+    def request_stop(self):
+        self.events.put((None, None, None))
+
+    def next_exit(self) -> tuple:
+        """
+        阻塞等待下一个有效退出事件，返回 (服务名, 退出的进程, 退出码)；收到停止请求时返回 (None, None, None)。
+        重启/停止过程中旧进程的退出事件（proc 已不是当前进程）会被丢弃。
+        """
+        while True:
+            try:
+                # Windows 上无超时的阻塞等待无法被 Ctrl+C 打断，因此保留低频唤醒
+                svc_name, proc, rc = self.events.get(timeout=1.0 if os.name == "nt" else None)
+            except queue.Empty:
+                continue
+            if svc_name is None:
+                return None, None, None
+            with self.lock:
+                if proc is self.services()[svc_name].proc:
+                    return svc_name, proc, rc
+
+    def set_policy(
+        self,
+        svc_name: str,
+        start: Callable[[], object],
+        policy: str = "on-failure",
+        max_crashes: int = 5,
+        window: float = 60.0,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+    ):
+        if policy not in self.RESTART_POLICIES:
+            ConsolePrinter.print(self.name, f"Unknown restart policy {policy!r} for {svc_name}, using 'on-failure'")
+            policy = "on-failure"
+        self.policies[svc_name] = {
+            "start": start,
+            "policy": policy,
+            "max_crashes": max_crashes,
+            "window": window,
+            "backoff_base": backoff_base,
+            "backoff_max": backoff_max,
+        }
+        self.stats.setdefault(svc_name, {"restarts": 0, "last_exit": None, "crashes": deque()})
+
+    def handle_exit(
+        self,
+        svc_name: str,
+        proc: subprocess.Popen,
+        returncode: Optional[int],
+        stop_event: Optional[threading.Event] = None,
+    ) -> bool:
+        """
+        服务进程退出时调用（proc 为 next_exit 返回的已退出进程）。返回 True 表示已处理（已重启 / 按策略保持停止），
+        返回 False 表示需要整体关停（never 策略或超出 crash loop 预算）。
+        next_exit 释放锁之后，控制端口的 restart 可能已经换上新进程：此时只认新进程，不再清空也不再重启。
+        """
+        pol = self.policies.get(svc_name)
+        svc = self.services()[svc_name]
+        with self.lock:
+            if svc.proc is not proc:
+                return True
+            svc.proc = None
+        st = self.stats.setdefault(svc_name, {"restarts": 0, "last_exit": None, "crashes": deque()})
+        st["last_exit"] = returncode
+        if pol is None or pol["policy"] == "never":
+            return False
+        if pol["policy"] == "on-failure" and returncode == 0:
+            ConsolePrinter.print(self.name, f"{svc_name} exited cleanly (code 0); policy=on-failure -> not restarting")
+            return True
+
+        while True:
+            now = time.monotonic()
+            crashes = st["crashes"]
+            crashes.append(now)
+            while crashes and now - crashes[0] > pol["window"]:
+                crashes.popleft()
+            if len(crashes) > pol["max_crashes"]:
+                ConsolePrinter.print(
+                    self.name,
+                    f"{svc_name} crashed {len(crashes)} times in {pol['window']:.0f}s -> crash loop, giving up",
+                )
+                return False
+
+            delay = min(pol["backoff_base"] * (2 ** (len(crashes) - 1)), pol["backoff_max"])
+            ConsolePrinter.print(
+                self.name,
+                f"{svc_name} exited (code {st['last_exit']}); restart #{st['restarts'] + 1} in {delay:.1f}s "
+                f"({len(crashes)}/{pol['max_crashes']} crashes in {pol['window']:.0f}s)",
+            )
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return True
+            else:
+                time.sleep(delay)
+
+            with self.lock:
+                # 退避期间已被手动 restart 拉起则不再重复启动（否则同一端口会起第二个实例）
+                if svc.proc is not None and svc.proc.poll() is None:
+                    return True
+                st["restarts"] += 1
+                ok, msg = self._restart(svc_name, pol["start"])
+            ConsolePrinter.print(self.name, msg)
+            if ok:
+                return True
+            # 启动失败同样计为一次崩溃：清理残留进程后继续退避重试
+            svc.stop()
+            st["last_exit"] = "start-failed"
+
+    def services(self) -> dict:
+        return {"redis": self.redis, "backend": self.backend, "frontend": self.frontend}
+
+    def status(self) -> str:
+        lines = []
+        for svc_name, svc in self.services().items():
+            proc = svc.proc
+            if proc is None:
+                state = "external" if svc.port_guard._is_open_localhost(svc.port) else "stopped"
+                pid = "-"
+            else:
+                state = "running" if proc.poll() is None else f"exited({proc.returncode})"
+                pid = proc.pid
+            line = f"{svc_name:<9} {state:<12} pid={pid} port={svc.port}"
+            if svc_name in self.policies:
+                st = self.stats[svc_name]
+                line += (
+                    f" policy={self.policies[svc_name]['policy']} restarts={st['restarts']}"
+                    f" last_exit={st['last_exit'] if st['last_exit'] is not None else '-'}"
+                )
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _restart(self, svc_name: str, start: Callable[[], object]) -> tuple[bool, str]:
+        svc = self.services()[svc_name]
+        with self.lock:
+            ConsolePrinter.print(self.name, f"Restarting {svc_name} ...")
+            svc.stop()
+            try:
+                if start() is False:
+                    return False, f"restart {svc_name} failed"
+            except SystemExit as e:
+                return False, f"restart {svc_name} failed (exit code {e.code})"
+            except Exception as e:
+                return False, f"restart {svc_name} failed: {e}"
+            self.watch(svc_name)
+        return True, f"{svc_name} restarted (pid={svc.proc.pid if svc.proc else '-'})"
+
+    def restart(self, svc_name: str, start: Callable[[], object]) -> str:
+        """只重启单个服务：停止其进程树后重新 start，其它服务与缓存保持不动。"""
+        return self._restart(svc_name, start)[1]
 
     def shutdown_all(self):
         ConsolePrinter.print(self.name, "Shutting down services ...")
@@ -972,67 +3718,503 @@ class ServiceSupervisor:
         ConsolePrinter.print(self.name, "All services stopped.")
 
 
+class ConfigWatcher:
+    """
+    监视三个 env 文件（轮询 mtime/size），变化后重新解析并按键比对，只重启受影响的服务：
+    1) backend/.env.dev 的键、根 .env 中的非 VITE_* 键 -> 只重启后端（uvicorn）
+    2) VITE_* 键（frontend/.env.development 或根 .env）-> 只重启前端（Vite）
+    3) Redis 与未受影响的服务保持运行；CONFIG_WATCH_INTERVAL=0 关闭监视
+    """
+
+    name = "ConfigWatch"
+    # 仅供启动器自身使用的键，变化不影响任何服务
+    LAUNCHER_KEYS = {"REDIS_PATH", "NODEJS_PATH", "FRONTEND_REINSTALL_POLICY"}
+
+    def __init__(self, layers: LayeredConfig, on_change: Callable[[str, list], object], interval: float = 1.0):
+        self.layers = layers
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._sigs = {n: self._sig(p) for n, p in layers.files.items()}
+        self._values = {n: layers.layer(n) for n in layers.files}
+
+    @staticmethod
+    def _sig(path: Path):
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    @staticmethod
+    def diff(old: dict, new: dict) -> list[str]:
+        return sorted(k for k in old.keys() | new.keys() if old.get(k) != new.get(k))
+
+    def affected(self, layer: str, keys: list[str]) -> dict[str, list[str]]:
+        out: dict[str, list[str]] = {}
+        for k in keys:
+            if k in self.LAUNCHER_KEYS:
+                continue
+            if k.startswith("VITE_"):
+                svc = "frontend"
+            elif layer == "frontend":
+                continue  # 非 VITE_* 键不会暴露给前端代码
+            elif layer == "root" and k in self._values["backend"]:
+                continue  # 被 backend/.env.dev 覆盖，后端实际取值未变
+            else:
+                svc = "backend"
+            out.setdefault(svc, []).append(k)
+        return out
+
+    def start(self):
+        threading.Thread(target=self._loop, name="config-watch", daemon=True).start()
+        ConsolePrinter.print(self.name, f"Watching env files every {self.interval:g}s")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            changed = [n for n, p in self.layers.files.items() if self._sig(p) != self._sigs[n]]
+            if not changed:
+                continue
+            # 去抖：编辑器常分多次写入，等一个周期后再解析
+            if self._stop.wait(self.interval):
+                return
+            pending: dict[str, list[str]] = {}
+            for n in changed:
+                self._sigs[n] = self._sig(self.layers.files[n])
+                new = self.layers.layer(n)
+                keys = self.diff(self._values[n], new)
+                self._values[n] = new
+                for svc, ks in self.affected(n, keys).items():
+                    pending.setdefault(svc, []).extend(ks)
+            if not pending:
+                ConsolePrinter.print(self.name, f"{', '.join(changed)} env changed; no service affected")
+            for svc, keys in pending.items():
+                ConsolePrinter.print(self.name, f"Changed {', '.join(keys)} -> restarting {svc}")
+                try:
+                    self.on_change(svc, keys)
+                except Exception as e:
+                    ConsolePrinter.print(self.name, f"Restart {svc} failed: {e}")
+
+
+class ControlServer:
+    """
+    常驻模式（--daemon）的本地控制端点：仅监听 127.0.0.1，端口与令牌写入项目根目录 .mma_control.json。
+    协议：每个连接发送一行 "<token> <command> [args...]"，服务端返回文本结果后关闭连接。
+    命令由 handlers 提供：status / restart <service> / stop / tail <service> [n]
+    """
+
+    name = "Control"
+    STATE_FILE = ".mma_control.json"
+
+    def __init__(self, project_root: Path, handlers: dict, port: int = 0):
+        self.state_file = project_root / self.STATE_FILE
+        self.handlers = handlers
+        self.token = secrets.token_hex(16)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", port))
+        self.sock.listen(4)
+        self.port = self.sock.getsockname()[1]
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.state_file.write_text(
+            json.dumps({"port": self.port, "token": self.token, "pid": os.getpid()}), encoding="utf-8"
+        )
+        self._thread = threading.Thread(target=self._serve, name="control", daemon=True)
+        self._thread.start()
+        ConsolePrinter.print(self.name, f"Control endpoint on 127.0.0.1:{self.port} ({self.state_file.name})")
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return  # close() 之后
+            # restart 可能持续数十秒，每个连接单独处理，避免阻塞 status/tail
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn: socket.socket):
+        with conn:
+            try:
+                conn.settimeout(10)
+                data = b""
+                while not data.endswith(b"\n") and len(data) < 4096:
+                    chunk = conn.recv(1024)
+                    if not chunk:
+                        break
+                    data += chunk
+                parts = data.decode("utf-8", errors="replace").split()
+                if len(parts) < 2 or not secrets.compare_digest(parts[0], self.token):
+                    reply = "error: unauthorized"
+                elif parts[1] not in self.handlers:
+                    reply = f"error: unknown command {parts[1]!r} (available: {', '.join(self.handlers)})"
+                else:
+                    reply = self.handlers[parts[1]](parts[2:])
+            except Exception as e:
+                reply = f"error: {type(e).__name__}: {e}"
+            try:
+                conn.sendall((reply.rstrip("\n") + "\n").encode("utf-8"))
+            except OSError:
+                pass
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        try:
+            self.state_file.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    @staticmethod
+    def send(project_root: Path, command: list, timeout: float = 180.0) -> str:
+        """客户端：读取 .mma_control.json 并把命令发给常驻启动器。"""
+        state_file = project_root / ControlServer.STATE_FILE
+        try:
+            state = json.loads(state_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            raise RuntimeError(f"No running launcher daemon ({state_file} missing)")
+        with socket.create_connection(("127.0.0.1", state["port"]), timeout=timeout) as s:
+            s.sendall((" ".join([state["token"], *command]) + "\n").encode("utf-8"))
+            chunks = []
+            while True:
+                chunk = s.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return b"".join(chunks).decode("utf-8", errors="replace")
+
+
+class ServiceGraph:
+    """
+    声明式服务依赖图：节点在其依赖全部就绪后立即启动，无依赖的节点在 t=0 同时启动。
+    1) start(cancel, timeout) 返回 True 视为就绪；返回 False / 抛异常 / sys.exit 视为失败
+    2) 每个节点有独立的启动时限（deadline，秒），超时即视为失败
+    3) 任一节点失败 -> 置位 cancel：未启动的节点不再启动，正在等待端口的节点尽快退出
+    """
+
+    name = "ServiceGraph"
+
+    def __init__(self):
+        self._nodes: dict[str, dict] = {}
+        self._threads: list[threading.Thread] = []
+        self.cancel = threading.Event()
+
+    def add(self, name: str, start: Callable[[threading.Event, float], object], deps=(), deadline: float = 30.0):
+        for d in deps:
+            if d not in self._nodes:
+                raise ValueError(f"Unknown dependency {d!r} for service {name!r}")
+        self._nodes[name] = {"start": start, "deps": tuple(deps), "deadline": float(deadline)}
+
+    def _worker(self, name: str, results: "queue.Queue"):
+        node = self._nodes[name]
+        try:
+            with PROFILER.span(f"start:{name}", kind="service"):
+                ok = node["start"](self.cancel, node["deadline"])
+            err = "" if ok is not False else "start returned False"
+            results.put((name, ok is not False, err))
+        except SystemExit as e:
+            results.put((name, False, f"exit code {e.code}"))
+        except Exception as e:
+            results.put((name, False, f"{type(e).__name__}: {e}"))
+
+    def run(self) -> bool:
+        t0 = time.monotonic()
+        results: "queue.Queue" = queue.Queue()
+        pending = list(self._nodes)
+        running: dict[str, float] = {}  # name -> 绝对截止时间
+        done: set[str] = set()
+
+        while pending or running:
+            for name in [n for n in pending if all(d in done for d in self._nodes[n]["deps"])]:
+                pending.remove(name)
+                running[name] = time.monotonic() + self._nodes[name]["deadline"]
+                ConsolePrinter.print(self.name, f"Starting {name} (t=+{time.monotonic() - t0:.2f}s)")
+                t = threading.Thread(target=self._worker, args=(name, results), name=f"svc-{name}", daemon=True)
+                self._threads.append(t)
+                t.start()
+
+            if not running:
+                # 有待启动节点但无可运行节点：依赖无法满足
+                return self._fail(pending[0], "unsatisfiable dependencies")
+
+            # 额外 1s 宽限：节点内部的端口等待本身也按 deadline 超时
+            wait = max(0.0, min(running.values()) + 1.0 - time.monotonic())
+            try:
+                name, ok, err = results.get(timeout=wait)
+            except queue.Empty:
+                name = min(running, key=running.get)
+                return self._fail(name, f"deadline {self._nodes[name]['deadline']:.0f}s exceeded")
+
+            running.pop(name, None)
+            if not ok:
+                return self._fail(name, err)
+            done.add(name)
+            ConsolePrinter.print(self.name, f"{name} ready (t=+{time.monotonic() - t0:.2f}s)")
+
+        ConsolePrinter.print(self.name, f"All services ready in {time.monotonic() - t0:.2f}s")
+        return True
+
+    def _fail(self, name: str, reason: str) -> bool:
+        self.cancel.set()
+        ConsolePrinter.print(self.name, f"{name} failed: {reason}; cancelling remaining services")
+        # 等待仍在运行的节点观察到 cancel 并返回，保证其子进程句柄已落到 service.proc 上，便于随后统一清理
+        for t in self._threads:
+            t.join(timeout=3)
+        return False
+
+
 # ========= 启动器 =========
+# 常驻模式控制端口：0 表示由系统分配（实际端口写入 .mma_control.json）
+CONTROL_PORT = int(os.getenv("CONTROL_PORT", "0"))
+
+
 class MathModelAgentLauncher:
     name = "Launcher"
 
-    def __init__(self):
+    def __init__(self, daemon: bool = False):
         self.project_root = Path.cwd()
-        self.cfg = ConfigManager(self.project_root / ".env")
+        self.daemon = daemon
+        with PROFILER.span("config:load"):
+            # 先取进程环境快照，再由 ConfigManager 把根 .env 注入 os.environ
+            self.layers = LayeredConfig(self.project_root)
+            self.cfg = ConfigManager(self.project_root / ".env")
         self.port_guard = PortGuard()  # 新：端口管理
 
     def run(self):
-        CacheCleaner.clear(self.project_root)
-
-        # 选路径
-        redis_path = PathPicker.pick_and_validate(
-            self.cfg,
-            "REDIS_PATH",
-            "选择 Redis 安装目录（需包含 redis-server.exe、redis-cli.exe）",
-            ["redis-server.exe", "redis-cli.exe"],
-        )
-        nodejs_path = PathPicker.pick_and_validate(
-            self.cfg, "NODEJS_PATH", "选择 Node.js 安装目录（需包含 node.exe、npm.cmd）", ["node.exe", "npm.cmd"]
-        )
+        with PROFILER.span("cache_clear"):
+            trash = TrashBin(self.project_root)
+            had_leftovers = TrashBin.pending(self.project_root)
+            CacheCleaner.clear(self.project_root, trash=trash)
+            # 本次移入回收站的目录 + 上次会话遗留的回收站，统一交给后台低优先级进程删除
+            if trash.used or had_leftovers:
+                TrashBin.spawn_worker(self.project_root, "trash")
+        manifest = LaunchManifest(self.project_root)
+
+        # 选路径（两次写 .env 合并为一次提交）
+        with PROFILER.span("preflight:paths"), self.cfg.transaction():
+            redis_path = PathPicker.pick_and_validate(
+                self.cfg,
+                "REDIS_PATH",
+                "选择 Redis 安装目录（需包含 redis-server.exe、redis-cli.exe）",
+                ["redis-server.exe", "redis-cli.exe"],
+                manifest=manifest,
+                discover="redis",
+            )
+            nodejs_path = PathPicker.pick_and_validate(
+                self.cfg,
+                "NODEJS_PATH",
+                "选择 Node.js 安装目录（需包含 node.exe、npm.cmd）",
+                ["node.exe", "npm.cmd"],
+                manifest=manifest,
+                discover="node",
+            )
 
-        # .env 准备 + 后端依赖安装 + 前端依赖安装
-        EnvFileManager.copy_envs(self.project_root)
-        _ = BackendInstaller.install(self.project_root)
+        # .env 准备 + 后端/前端依赖并行安装
+        with PROFILER.span("preflight:env_files"):
+            EnvFileManager.copy_envs(self.project_root)
+        InstallPhase.run(
+            {
+                "backend": lambda: BackendInstaller.install(self.project_root, self.layers, manifest=manifest),
+                "frontend": lambda: FrontendInstaller.install(
+                    self.project_root, nodejs_path, self.cfg, manifest=manifest
+                ),
+            }
+        )
+        manifest.save()
 
         backend_port = int(os.getenv("BACKEND_PORT", "8000"))
         frontend_port = int(os.getenv("FRONTEND_PORT", "5173"))
 
-        FrontendInstaller.install(self.project_root, nodejs_path, self.cfg)
-
         # 服务实例
         redis = RedisService(self.port_guard, port=6379)
-        backend = BackendService(self.port_guard, port=backend_port, host="localhost")
-        frontend = FrontendService(self.port_guard, nodejs_path=nodejs_path, port=frontend_port, host="localhost")
+        backend = BackendService(self.port_guard, self.layers, port=backend_port, host="localhost")
+        frontend = FrontendService(
+            self.port_guard, self.layers, nodejs_path=nodejs_path, port=frontend_port, host="localhost"
+        )
         supervisor = ServiceSupervisor(backend, frontend, redis)
-
-        # 启动
-        if not redis.start(redis_path):
+        # 抓取输出才能过滤（LOG_FILTER=0 时非常驻模式恢复为直接继承控制台）；Redis 仍在独立控制台窗口运行
+        backend.capture = frontend.capture = self.daemon or LogFilter.enabled()
+        timeouts = {
+            "redis": float(os.getenv("REDIS_START_TIMEOUT", "30")),
+            "backend": float(os.getenv("BACKEND_START_TIMEOUT", "60")),
+            "frontend": float(os.getenv("FRONTEND_START_TIMEOUT", "60")),
+        }
+
+        # 启动：redis -> backend；frontend 无依赖，t=0 即启动
+        graph = ServiceGraph()
+        graph.add(
+            "redis",
+            lambda cancel, timeout: redis.start(redis_path, cancel=cancel, timeout=timeout),
+            deadline=timeouts["redis"],
+        )
+        graph.add(
+            "backend",
+            lambda cancel, timeout: backend.start(self.project_root, cancel=cancel, timeout=timeout),
+            deps=("redis",),
+            deadline=timeouts["backend"],
+        )
+        graph.add(
+            "frontend",
+            lambda cancel, timeout: frontend.start(self.project_root, cancel=cancel, timeout=timeout),
+            deadline=timeouts["frontend"],
+        )
+        ok = graph.run()
+        PROFILER.finish()
+        if not ok:
+            supervisor.shutdown_all()
             sys.exit(1)
 
-        backend.start(self.project_root)
-        frontend.start(self.project_root)
-
         ConsolePrinter.print(self.name, f"Backend running at http://localhost:{backend_port}")
         ConsolePrinter.print(self.name, f"Frontend running at http://localhost:{frontend_port}")
 
+        stop_event = threading.Event()
+        control: Optional[ControlServer] = None
+        starters = {
+            "backend": lambda: backend.start(self.project_root, timeout=timeouts["backend"]),
+            "frontend": lambda: frontend.start(self.project_root, timeout=timeouts["frontend"]),
+        }
+        for svc_name, start in starters.items():
+            supervisor.set_policy(
+                svc_name,
+                start,
+                policy=os.getenv(f"{svc_name.upper()}_RESTART_POLICY", "on-failure").strip().lower(),
+                max_crashes=int(os.getenv("RESTART_MAX_CRASHES", "5")),
+                window=float(os.getenv("RESTART_WINDOW_SEC", "60")),
+            )
+        if self.daemon:
+            control = ControlServer(
+                self.project_root, self._control_handlers(supervisor, starters, stop_event), port=CONTROL_PORT
+            )
+            control.start()
+        watcher: Optional[ConfigWatcher] = None
+        watch_interval = float(os.getenv("CONFIG_WATCH_INTERVAL", "1"))
+        if watch_interval > 0:
+            watcher = ConfigWatcher(
+                self.layers,
+                lambda svc_name, keys: ConsolePrinter.print(
+                    supervisor.name, supervisor.restart(svc_name, starters[svc_name])
+                ),
+                interval=watch_interval,
+            )
+            watcher.start()
+
+        supervisor.watch("backend")
+        supervisor.watch("frontend")
         try:
             while True:
-                time.sleep(1)
-                if frontend.proc and frontend.proc.poll() is not None:
-                    raise RuntimeError("Frontend crashed")
-                if backend.proc and backend.proc.poll() is not None:
-                    raise RuntimeError("Backend crashed")
+                svc_name, proc, rc = supervisor.next_exit()
+                if svc_name is None:
+                    break
+                if not supervisor.handle_exit(svc_name, proc, rc, stop_event):
+                    raise RuntimeError(f"{svc_name.capitalize()} crashed")
+            ConsolePrinter.print(self.name, "Stop requested via control endpoint")
         except RuntimeError as e:
             ConsolePrinter.print(self.name, f"Shutting down due to {e}")
         finally:
+            if watcher is not None:
+                watcher.stop()
+            if control is not None:
+                control.close()
             supervisor.shutdown_all()
-            CacheCleaner.clear(self.project_root)
+            # 退出时的缓存清理交给后台进程，窗口关闭时间只取决于服务进程的终止
+            if not TrashBin.spawn_worker(self.project_root, "exit"):
+                CacheCleaner.clear(self.project_root)
+
+    @staticmethod
+    def _control_handlers(supervisor: ServiceSupervisor, starters: dict, stop_event: threading.Event) -> dict:
+        def restart(args):
+            if not args or args[0] not in starters:
+                return f"usage: restart <{'|'.join(starters)}>"
+            return supervisor.restart(args[0], starters[args[0]])
+
+        def tail(args):
+            services = supervisor.services()
+            if not args or args[0] not in services:
+                return f"usage: tail <{'|'.join(services)}> [n]"
+            svc = services[args[0]]
+            if not hasattr(svc, "log"):
+                return f"{args[0]} output is not captured (runs in its own console)"
+            n = int(args[1]) if len(args) > 1 and args[1].isdigit() else 50
+            return "\n".join(list(svc.log)[-n:]) or "(no output yet)"
+
+        def stop(args):
+            stop_event.set()
+            supervisor.request_stop()
+            return "stopping"
+
+        return {"status": lambda args: supervisor.status(), "restart": restart, "tail": tail, "stop": stop}
+
+
+def main(argv: list = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MathModelAgent launcher")
+    parser.add_argument(
+        "--import-report", action="store_true", help="report the launcher's own import cost and exit"
+    )
+    parser.add_argument(
+        "--profile-startup", action="store_true", help="record a startup timeline under .mma_profile/"
+    )
+    parser.add_argument(
+        "--profile-report", action="store_true", help="compare the latest profiled startup against history and exit"
+    )
+    parser.add_argument(
+        "--clean-dry-run",
+        action="store_true",
+        help="list the bytecode caches the cleaner would delete (CACHE_CLEAN_MODE) and exit",
+    )
+    parser.add_argument(
+        "--store-report", action="store_true", help="show where the uv cache and pnpm store live and their disk usage"
+    )
+    parser.add_argument(
+        "--wheelhouse-build",
+        action="store_true",
+        help="download all backend wheels (plus uv) into the wheelhouse for OFFLINE_INSTALL=1 and exit",
+    )
+    parser.add_argument("--background-cleanup", choices=("exit", "trash"), help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--daemon", action="store_true", help="stay resident and serve a localhost control endpoint"
+    )
+    parser.add_argument(
+        "--ctl",
+        nargs="+",
+        metavar="CMD",
+        help="send a command to a running daemon: status | restart <backend|frontend> | stop | tail <service> [n]",
+    )
+    args = parser.parse_args(argv)
+
+    OutputConfigurator.configure()
+    if args.background_cleanup:
+        TrashBin.run_worker(Path.cwd(), args.background_cleanup)
+        return
+    if args.import_report:
+        sys.exit(0 if ImportProfiler.report() else 1)
+    if args.clean_dry_run:
+        CacheCleaner.clear(Path.cwd(), dry_run=True)
+        return
+    if args.profile_report:
+        sys.exit(0 if StartupProfiler.report(Path.cwd()) else 1)
+    if args.store_report:
+        StorePlacement.report(Path.cwd())
+        return
+    if args.wheelhouse_build:
+        sys.exit(0 if Wheelhouse.build(Path.cwd()) else 1)
+    if args.ctl:
+        try:
+            print(ControlServer.send(Path.cwd(), args.ctl), end="")
+        except (RuntimeError, OSError) as e:
+            ConsolePrinter.print("Control", str(e))
+            sys.exit(1)
+        return
+    if args.profile_startup:
+        PROFILER.enable(Path.cwd())
+    MathModelAgentLauncher(daemon=args.daemon).run()
 
 
 if __name__ == "__main__":
-    MathModelAgentLauncher().run()
+    main()
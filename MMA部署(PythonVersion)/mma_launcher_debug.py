@@ -23,6 +23,7 @@ import os
 import shutil
 import time
 import socket
+import queue
 from typing import Optional, List
 import threading
 
@@ -266,6 +267,9 @@ Bootstrapper.ensure_library_installed(
 # 其余导入在安装后进行
 import psutil  # noqa: E402
 
+# 子进程输出过滤与 mma_launcher.py 共用同一份实现与规则（两个脚本需放在同一目录）
+from mma_launcher import LogFilter  # noqa: E402
+
 
 # ========= Windows 原生弹窗 =========
 class Dialogs:
@@ -614,7 +618,6 @@ class BackendInstaller:
     def install(project_root: Path) -> Path:
         backend_dir = project_root / "backend"
         venv_dir = backend_dir / ".venv"
-        os.chdir(backend_dir)
 
         if os.getenv("BACKEND_SKIP_INSTALL", "").strip().lower() in ("1", "true", "yes"):
             if BackendInstaller._venv_ready(venv_dir):
@@ -664,7 +667,7 @@ class BackendInstaller:
         env.setdefault("UV_LINK_MODE", "copy")
 
         try:
-            subprocess.run(uv_cmd + ["sync"], check=True, text=True, env=env)
+            subprocess.run(uv_cmd + ["sync"], check=True, text=True, env=env, cwd=str(backend_dir))
         except subprocess.CalledProcessError as e:
             ConsolePrinter.print(
                 BackendInstaller.name, f"Failed to sync backend dependencies (uv). Return code={e.returncode}"
@@ -687,9 +690,7 @@ class FrontendInstaller:
 
     @staticmethod
     def _stream(cmd: List[str], env: dict, cwd: Optional[str] = None) -> int:
-        NOISE_PATTERNS = []
-        _noise = [re.compile(p) for p in NOISE_PATTERNS]
-
+        log_filter = LogFilter("pnpm")
         proc = subprocess.Popen(
             cmd,
             cwd=cwd,
@@ -705,9 +706,13 @@ class FrontendInstaller:
             plain = strip_ansi(line).strip()
             if not plain:
                 continue
-            if any(rx.search(plain) for rx in _noise):
-                continue
-            ConsolePrinter.raw_from_proc("pnpm", line)
+            for out in log_filter.process(line.rstrip("\r\n")):
+                ConsolePrinter.raw_from_proc("pnpm", out)
+        for out in log_filter.flush():
+            ConsolePrinter.raw_from_proc("pnpm", out)
+        summary = log_filter.summary()
+        if summary:
+            ConsolePrinter.print(FrontendInstaller.name, summary)
         proc.wait()
         return proc.returncode
 
@@ -738,7 +743,6 @@ class FrontendInstaller:
         ConsolePrinter.print(FrontendInstaller.name, f"Using .env at: {cfg.env_file}")
 
         frontend_dir = project_root / "frontend"
-        os.chdir(frontend_dir)
         npm_path = Path(nodejs_path) / "npm.cmd"
         node_path = Path(nodejs_path) / "node.exe"
 
@@ -761,6 +765,7 @@ class FrontendInstaller:
                 [str(npm_path), "--version"],
                 check=True,
                 env=env,
+                cwd=str(frontend_dir),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 text=True,
@@ -959,10 +964,11 @@ class PortGuard:
 
 # === 通用子进程输出抓取器 ===
 class ProcStreamer:
-    def __init__(self, name: str, proc: subprocess.Popen, suppress: Optional[List[re.Pattern]] = None):
+    def __init__(self, name: str, proc: subprocess.Popen, suppress: Optional[List[tuple]] = None):
+        """suppress：额外的 (正则, 预筛子串) 噪声规则，并入 LogFilter 的合并正则。"""
         self.name = name
         self.proc = proc
-        self.suppress = suppress or []
+        self.filter = LogFilter(name, extra_noise=suppress)
         self.thread = threading.Thread(target=self._pump, daemon=True)
         self.thread.start()
 
@@ -981,7 +987,13 @@ class ProcStreamer:
                 for part in line.splitlines():
                     if strip_ansi(part).strip() == "":
                         continue
-                    ConsolePrinter.raw_from_proc(self.name, part)
+                    for out in self.filter.process(part):
+                        ConsolePrinter.raw_from_proc(self.name, out)
+            for out in self.filter.flush():
+                ConsolePrinter.raw_from_proc(self.name, out)
+            summary = self.filter.summary()
+            if summary:
+                ConsolePrinter.print(self.name, summary)
         except Exception as e:
             ConsolePrinter.print(self.name, f"[pump] error: {e}")
 
@@ -1132,13 +1144,12 @@ class FrontendService:
         self.stream: Optional[ProcStreamer] = None
 
     @staticmethod
-    def _noise_patterns() -> List[re.Pattern]:
-        pats = []
-        return [re.compile(p) for p in pats]
+    def _noise_patterns() -> List[tuple]:
+        """Vite 专属的额外噪声规则：(正则, 预筛子串)；通用规则见 LogFilter。"""
+        return []
 
     def start(self, project_root: Path):
         frontend_dir = project_root / "frontend"
-        os.chdir(frontend_dir)
         npm_path = Path(self.nodejs_path) / "npm.cmd"
         node_exe = Path(self.nodejs_path) / "node.exe"
 
@@ -1360,22 +1371,21 @@ class MathModelAgentLauncher:
             ConsolePrinter.print(self.name, f"Backend running at http://localhost:{backend_port}")
             ConsolePrinter.print(self.name, f"Frontend running at http://localhost:{frontend_port}")
 
-            # 守护循环
+            # 守护循环：每个子进程一个阻塞 wait() 线程，退出事件汇入同一队列，无需每秒轮询端口/进程
+            exits: "queue.Queue" = queue.Queue()
+            for label, svc in (("Backend", backend), ("Frontend", frontend)):
+                if svc.proc is not None:
+                    threading.Thread(
+                        target=lambda label=label, proc=svc.proc: exits.put((label, proc.wait())), daemon=True
+                    ).start()
             try:
-                back_fail, front_fail = 0, 0
                 while True:
-                    time.sleep(1)
-
-                    back_ok = self.port_guard._is_open_localhost(backend_port)
-                    front_ok = self.port_guard._is_open_localhost(frontend_port)
-
-                    back_fail = 0 if back_ok else back_fail + 1
-                    front_fail = 0 if front_ok else front_fail + 1
-
-                    if backend.proc and backend.proc.poll() is not None and back_fail >= 3:
-                        raise RuntimeError("Backend crashed")
-                    if frontend.proc and frontend.proc.poll() is not None and front_fail >= 3:
-                        raise RuntimeError("Frontend crashed")
+                    try:
+                        # Windows 上无超时的阻塞等待无法被 Ctrl+C 打断，因此保留低频唤醒
+                        label, rc = exits.get(timeout=1.0 if os.name == "nt" else None)
+                    except queue.Empty:
+                        continue
+                    raise RuntimeError(f"{label} crashed (exit code {rc})")
             except KeyboardInterrupt:
                 ConsolePrinter.print(self.name, "KeyboardInterrupt -> 正在优雅退出...")
             except RuntimeError as e: